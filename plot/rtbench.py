@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# coding=utf-8
+'''
+Author       : Jay jay.zhangjunjie@outlook.com
+Date         : 2026-10-18 10:00:00
+LastEditTime : 2026-10-18 10:00:00
+LastEditors  : Jay jay.zhangjunjie@outlook.com
+Description  : rtplot端到端性能测试, 使用合成数据的PUB驱动Suber和RealTimePlot(Qt offscreen), 结果保存为JSON
+'''
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+from rtplot import BinaryFormat, PlotWindowType, Puber, RealTimePlot, RenderProfile, Suber
+
+
+"""
+    How to use
+        python rtbench.py                                                       # 默认参数: 1000Hz, 3通道, 文本格式, 运行5s
+        python rtbench.py --rates 500 2000 --channels 3 6 --formats text binary  # 按参数组合依次运行
+        python rtbench.py --endpoint ipc:///tmp/rtbench --batch --output bench.json
+        python rtbench.py --rates 10000 --channels 8 --batch --profiles quality performance  # 比较不同绘制参数
+
+    测试结果:
+        msgPerSec       实际接收的消息速率, 按第一个到最后一个数据的接收时间计算
+        dropped         发送但未接收的消息数(HWM丢弃或未及时接收)
+        pointsPerSec    写入子窗口的数据点速率(消息速率 * 通道数)
+        drawnPointsPerSec  每帧传给曲线的数据点数之和 / 运行时间, 即重绘能够承受的点速率
+        latencyP50Ms    每个数据从接收到所在帧重绘完成的延时, 中位数
+        latencyP99Ms    同上, 99分位
+        cpuPercent      绘图进程(接收线程 + GUI线程)的CPU占用, 100表示一个核心
+        stages          RealTimePlot.stats()中各阶段的耗时统计
+"""
+
+
+PUB_WARMUP = 1.0    # PUB绑定后等待SUB连接的时间, 避免丢失前几个数据包
+DRAIN_TIME = 0.5    # 发送结束后继续接收的时间
+
+
+def publisher(address, rate, channels, wireFormat, duration, hwm, sent):
+    """以固定速率发送合成数据, 在独立的进程中运行, 结束后将发送数量写入sent"""
+    fmt = BinaryFormat(channels) if wireFormat == "binary" else None
+    puber = Puber(address, wireFormat=fmt, hwm=hwm)
+    time.sleep(PUB_WARMUP)
+
+    count = 0
+    t0 = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - t0
+        if elapsed >= duration:
+            break
+        due = int(elapsed * rate)
+        while count < due:
+            t = count / rate
+            values = np.sin(2 * np.pi * (1 + np.arange(channels)) * t)
+            if fmt is None:
+                # 文本格式第一列为序号
+                puber.send([count, *values])
+            else:
+                puber.send(values)
+            count += 1
+        time.sleep(0.0005)
+    sent.value = count
+    time.sleep(DRAIN_TIME)
+    puber.close()
+
+
+class BenchPlot(RealTimePlot):
+    """记录每一帧中新数据从接收到重绘完成的延时"""
+
+    def __init__(self, title, msec, suber, profile=None):
+        super().__init__(title, msec, suber, profile)
+        self.latencies = []
+        self.frames = 0
+        self.drawnPoints = 0
+        self._renderedX = -np.inf
+
+
+    def renderFrame(self):
+        super().renderFrame()
+        if not self._plots or self._suber._firstRecvT is None:
+            return
+        now = time.perf_counter()
+        x_data = next(iter(self._plots.values())).x_data
+        start = np.searchsorted(x_data, self._renderedX, side="right")
+        if start < len(x_data):
+            # totalTime为相对于第一次接收的时间, 换算回接收时刻的perf_counter
+            self.latencies.append(now - (self._suber._firstRecvT + x_data[start:]))
+            self._renderedX = x_data[-1]
+            self.frames += 1
+            self.drawnPoints += sum(len(subWindow.curve.xData) for subWindow in self._plots.values() if subWindow.curve.xData is not None)
+
+
+def runBenchmark(endpoint, rate, channels, wireFormat, duration, batch, msec, hwm, profile="quality", useOpenGL=False):
+    app = QApplication.instance() or QApplication(sys.argv)
+    ctx = mp.get_context("spawn")
+    sent = ctx.Value("q", 0)
+    pubProcess = ctx.Process(target=publisher, args=(endpoint, rate, channels, wireFormat, duration, hwm, sent), daemon=True)
+
+    names = [f"c{i}" for i in range(channels)]
+    if wireFormat == "binary":
+        suber = Suber(endpoint, batch=batch, columns=names, wireFormat=BinaryFormat(channels), hwm=hwm)
+    else:
+        suber = Suber(endpoint, batch=batch, columns=["seq"] + names, hwm=hwm)
+
+    renderProfile = RenderProfile.performance(useOpenGL) if profile == "performance" else RenderProfile(useOpenGL=useOpenGL)
+    rtPlot = BenchPlot("rtbench", msec, suber, renderProfile)
+    for i, name in enumerate(names):
+        rtPlot.addSubWindow(title=name, callback=name, row=i, col=0, windowType=PlotWindowType.ROLL_WINDOW, sampleRate=rate)
+
+    suber.start()
+    pubProcess.start()
+    time.sleep(PUB_WARMUP)
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    QTimer.singleShot(int((duration + DRAIN_TIME) * 1000), app.quit)
+    app.exec_()
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    suber.stop()
+    pubProcess.join()
+    stats = rtPlot.stats()
+    rtPlot.close()
+
+    latencies = np.concatenate(rtPlot.latencies) if rtPlot.latencies else np.array([np.nan])
+    # 消息在duration + DRAIN_TIME内计数, 速率按实际接收的时间跨度计算
+    span = suber._lastRecvT - suber._firstRecvT if suber.count > 1 else 0
+    span = span if span > 0 else duration
+    return {
+        "sent": int(sent.value),
+        "received": suber.count,
+        "dropped": int(sent.value) - suber.count,
+        "msgPerSec": suber.count / span,
+        "pointsPerSec": suber.count * channels / span,
+        "drawnPointsPerSec": rtPlot.drawnPoints / wall,
+        "frames": rtPlot.frames,
+        "fps": rtPlot.frames / wall,
+        "latencyP50Ms": float(np.percentile(latencies, 50) * 1000),
+        "latencyP99Ms": float(np.percentile(latencies, 99) * 1000),
+        "cpuPercent": cpu / wall * 100,
+        "stages": stats["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rtplot end-to-end benchmark")
+    parser.add_argument("--endpoint", default="tcp://127.0.0.1:5560", help="tcp://host:port 或 ipc://path, tcp时每组参数使用递增的端口")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1000], help="发送频率(Hz)")
+    parser.add_argument("--channels", type=int, nargs="+", default=[3], help="通道数")
+    parser.add_argument("--formats", nargs="+", default=["text"], choices=["text", "binary"], help="数据格式")
+    parser.add_argument("--duration", type=float, default=5, help="每组参数的发送时长(s)")
+    parser.add_argument("--batch", action="store_true", help="Suber使用批量模式")
+    parser.add_argument("--msec", type=int, default=16, help="重绘间隔(ms)")
+    parser.add_argument("--hwm", type=int, default=100, help="PUB和SUB的HWM")
+    parser.add_argument("--profiles", nargs="+", default=["quality"], choices=["quality", "performance"], help="子窗口的绘制参数(RenderProfile)")
+    parser.add_argument("--opengl", action="store_true", help="使用OpenGL绘制")
+    parser.add_argument("--output", default=None, help="结果JSON文件, 默认为rtbench_时间.json")
+    args = parser.parse_args()
+
+    runs = []
+    index = 0
+    for profile in args.profiles:
+        for wireFormat in args.formats:
+            for channels in args.channels:
+                for rate in args.rates:
+                    endpoint = args.endpoint
+                    if endpoint.startswith("tcp://"):
+                        host, port = endpoint.rsplit(":", 1)
+                        endpoint = f"{host}:{int(port) + index}"
+                    else:
+                        endpoint = f"{endpoint}{index}"
+                    index += 1
+                    config = {"endpoint": endpoint, "rate": rate, "channels": channels, "format": wireFormat, "profile": profile,
+                              "opengl": args.opengl, "duration": args.duration, "batch": args.batch, "msec": args.msec, "hwm": args.hwm}
+                    results = runBenchmark(endpoint, rate, channels, wireFormat, args.duration, args.batch, args.msec, args.hwm,
+                                           profile, args.opengl)
+                    print(json.dumps({"config": config, "results": results}))
+                    runs.append({"config": config, "results": results})
+
+    output = args.output or datetime.now().strftime("rtbench_%Y%m%d_%H_%M_%S.json")
+    with open(output, "w") as f:
+        json.dump({"time": datetime.now().isoformat(), "platform": platform.platform(), "python": platform.python_version(),
+                   "runs": runs}, f, indent=4)
+    print(f"Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,143 +7,2133 @@ LastEditTime : 2024-09-20 11:21:20
 LastEditors  : Jay jay.zhangjunjie@outlook.com
 Description  : 
 '''
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import re
 import sys
 import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, replace
 from datetime import datetime
 from enum import IntEnum
-from threading import Event
+from multiprocessing import shared_memory
+from queue import Empty, Queue
+from threading import Event, Thread
 from typing import Callable
 import warnings
 
 import numpy as np
 import pyqtgraph as pg
 import zmq
-from PyQt5.QtCore import QThread, pyqtSignal
-from PyQt5.QtWidgets import QApplication, QMainWindow
+import zmq.asyncio
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow
 from pyqtgraph.Qt import QtGui
 
+try:
+    from scipy import signal as scipySignal
+except ImportError:
+    scipySignal = None      # IIRFilter依赖scipy, 没有scipy时退化为逐点计算的慢速实现
+
 # 禁用科学记数法
 np.set_printoptions(suppress=True)
 
 
 
-"""
-    Example Puber From Zmq:
-    puber = zmq.Context().socket(zmq.PUB)
-    puber.bind("tcp://127.0.0.1:5555")
-    puber.set_hwm(100)
+"""
+    Example Puber From Zmq:
+    puber = zmq.Context().socket(zmq.PUB)
+    puber.bind("tcp://127.0.0.1:5555")
+    puber.set_hwm(100)
+
+    while 1:
+        time.sleep(0.015)
+        s = f"{x},{y},{z}"
+        puber.send_string(s)
+
+    Example Binary Puber:
+    puber = Puber("tcp://127.0.0.1:5555", wireFormat=BinaryFormat(3))
+    suber = Suber("tcp://127.0.0.1:5555", wireFormat=BinaryFormat(3), columns=["x", "y", "z"])
+
+    while 1:
+        time.sleep(0.015)
+        puber.send([x, y, z])
+
+    Example Async Suber:
+    async for batch in AsyncSuber("tcp://127.0.0.1:5555", columns=["x", "y", "z"], batch=True):
+        print(batch.values)
+
+    bridge = AsyncBridge()
+    source = AsyncSource(AsyncSuber("tcp://127.0.0.1:5555", columns=["x", "y", "z"]), bridge)
+    rtPlot = RealTimePlot("RealTimePlot", 16, source)
+    source.start()
+"""
+
+"""
+    PUB&SUB
+
+    通信延时:
+        在本机通信的情况下,PUB和SUB设置HWM为100, 发送方0.015间隔,发送114个数据后接受方为1.710053 | 1.7101030349731445
+
+    如何解决前几个数据包丢失的情况:
+        先打开SUB,再打开PUB
+        PUB打开后延时1s左右在发送
+        HWM设置尽量搞一些,在本文测试中,100的HWM已经可以避免前几个数据包丢失的情况
+"""
+
+
+
+@dataclass
+class RTMessage:
+    timestamp:float     # 本地接受的时间戳
+    totalTime:float     # 本次开始接受至本次消息到达的时间总长
+    message:str         # 传输的数据,该数据中也可以添加时间戳
+    values:np.ndarray = None    # Suber解码后的一行数据, 未开启解码或解码失败时为None
+    seq:int = None              # 发布端的序号, 数据不带头部时为None
+    sendTime:float = None       # 发布端的发送时间戳(time.time()), 数据不带头部时为None
+    topic:str = None            # 消息所属的topic
+
+
+@dataclass
+class RTBatch:
+    """批量模式下一次唤醒接收到的全部消息"""
+    timestamps:np.ndarray   # 每条消息本地接受的时间戳
+    totalTimes:np.ndarray   # 每条消息相对于第一条消息的时间
+    messages:list           # 每条消息的原始数据
+    values:np.ndarray = None    # 解码后的数据块, shape为(消息数, 列数)
+    seqs:np.ndarray = None      # 发布端的序号
+    sendTimes:np.ndarray = None # 发布端的发送时间戳
+    topic:str = None            # 同一批中的消息属于同一个topic
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        for i, (timestamp, totalTime, message) in enumerate(zip(self.timestamps, self.totalTimes, self.messages)):
+            values = None if self.values is None else self.values[i]
+            seq = None if self.seqs is None else int(self.seqs[i])
+            sendTime = None if self.sendTimes is None else self.sendTimes[i]
+            yield RTMessage(timestamp=timestamp, totalTime=totalTime, message=message, values=values, seq=seq, sendTime=sendTime, topic=self.topic)
+
+
+class BinaryFormat:
+    """
+        二进制数据格式: 可选的头部(序号seq:uint64, 发送时间戳stamp:float64) + channels个dtype类型的数据
+
+        一帧中可以连续存放多条记录, 接收端通过np.frombuffer直接将帧的内存视为结构化数组, 不需要文本解析
+    """
+
+    HEADER = [("seq", "<u8"), ("stamp", "<f8")]
+
+    def __init__(self, channels: int, dtype=np.float64, header: bool = True):
+        self.channels = channels
+        self.header = header
+        fields = list(self.HEADER) if header else []
+        fields.append(("values", np.dtype(dtype).newbyteorder("<"), (channels,)))
+        self.dtype = np.dtype(fields)
+
+
+    @property
+    def itemsize(self):
+        return self.dtype.itemsize
+
+
+    def encode(self, values, seq=0, stamp=0.0):
+        """将一行(channels,)或多行(n, channels)数据打包为bytes, 多行时seq依次递增"""
+        values = np.asarray(values).reshape(-1, self.channels)
+        records = np.zeros(len(values), dtype=self.dtype)
+        records["values"] = values
+        if self.header:
+            records["seq"] = seq + np.arange(len(values))
+            records["stamp"] = stamp
+        return records.tobytes()
+
+
+    def decode(self, buffer, offset=0):
+        """将帧的内存直接视为记录数组(不拷贝), 帧长度不是记录长度的整数倍时返回None"""
+        size = len(buffer) - offset
+        if size < 0 or size % self.itemsize:
+            return None
+        return np.frombuffer(buffer, dtype=self.dtype, offset=offset)
+
+
+
+class LatencyHistogram:
+    """
+        按对数分桶的耗时直方图, 记录一次为O(1), 用于统计均值和分位数
+
+        桶的范围为100ns~10s, 每个数量级BINS_PER_DECADE个桶, 分位数的相对误差约为10%
+    """
+
+    MIN_TIME = 1e-7
+    DECADES = 8
+    BINS_PER_DECADE = 24
+
+    def __init__(self):
+        self._counts = np.zeros(self.DECADES * self.BINS_PER_DECADE + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def record(self, seconds):
+        index = int(math.log10(seconds / self.MIN_TIME) * self.BINS_PER_DECADE) if seconds > self.MIN_TIME else 0
+        self._counts[min(index, len(self._counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+    def recordMany(self, seconds):
+        seconds = np.asarray(seconds, dtype=np.float64)
+        if len(seconds) == 0:
+            return
+        index = (np.log10(np.maximum(seconds, self.MIN_TIME) / self.MIN_TIME) * self.BINS_PER_DECADE).astype(np.int64)
+        self._counts += np.bincount(np.minimum(index, len(self._counts) - 1), minlength=len(self._counts))
+        self.count += len(seconds)
+        self.total += float(seconds.sum())
+        self.max = max(self.max, float(seconds.max()))
+
+
+    def percentile(self, q):
+        """返回第q(0~100)百分位所在桶的上边界(s)"""
+        if self.count == 0:
+            return None
+        index = int(np.searchsorted(np.cumsum(self._counts), self.count * q / 100))
+        return min(self.MIN_TIME * 10 ** ((index + 1) / self.BINS_PER_DECADE), self.max)
+
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "meanUs": self.total / self.count * 1e6, "p50Us": self.percentile(50) * 1e6,
+                "p99Us": self.percentile(99) * 1e6, "maxUs": self.max * 1e6}
+
+
+    def clear(self):
+        self._counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+
+class PipelineStats:
+    """
+        绘图流程各阶段的耗时统计
+
+        recv:       zmq接收(不包括等待数据的时间)
+        decode:     数据解码, 批量模式下为整批的耗时
+        read:       从共享内存读取(ProcessSuber)
+        derive:     计算RealTimePlot.addChannel添加的派生通道
+        callback:   子窗口从消息中取出(x, y)
+        append:     写入子窗口的缓冲区
+        render:     单个子窗口的重绘(setData等)
+        frame:      一帧的总重绘时间
+        每个阶段只由一个线程写入, 读取时不加锁, 结果为近似值
+    """
+
+    def __init__(self):
+        self._stages = {}
+
+
+    def record(self, stage, seconds):
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            histogram = self._stages[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+
+    def histogram(self, stage):
+        return self._stages.get(stage)
+
+
+    def snapshot(self):
+        return {stage: histogram.summary() for stage, histogram in list(self._stages.items())}
+
+
+    def clear(self):
+        for histogram in list(self._stages.values()):
+            histogram.clear()
+
+
+
+class SequenceTracker:
+    """
+        根据发布端的序号统计丢失和乱序的数据, 根据发送时间戳统计单向延时
+
+        序号小于已收到的最大序号时认为是乱序到达(此前已按丢失计数, 因此丢失数减一), 序号为0时认为发布端已重启.
+        单向延时要求发布端和接收端的时钟同步, 本机通信时可以直接使用
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.clear()
+
+
+    def clear(self):
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self._maxSeq = None
+        self.latency.clear()
+
+
+    def update(self, seq, sendTime=None, recvTime=None):
+        if self._maxSeq is None or seq == 0:
+            self._maxSeq = seq
+        elif seq > self._maxSeq:
+            self.lost += seq - self._maxSeq - 1
+            self._maxSeq = seq
+        else:
+            self.reordered += 1
+            self.lost = max(self.lost - 1, 0)
+        self.received += 1
+        if sendTime is not None and recvTime is not None:
+            self.latency.record(recvTime - sendTime)
+
+
+    def updateMany(self, seqs, sendTimes=None, recvTimes=None):
+        """批量更新, 结果与逐个调用update一致(序号为0的重启情况除外)"""
+        seqs = np.asarray(seqs, dtype=np.int64)
+        if len(seqs) == 0:
+            return
+        if self._maxSeq is None or seqs[0] == 0:
+            self._maxSeq = seqs[0] - 1
+        prevMax = np.maximum.accumulate(np.concatenate(([self._maxSeq], seqs[:-1])))
+        forward = seqs > prevMax
+        reordered = int(np.count_nonzero(~forward))
+        # 逐个更新时每次乱序后丢失数的下限为0, 等价于累加和加上max(初始丢失数, -累加和的最小值)
+        steps = np.cumsum(np.where(forward, seqs - prevMax - 1, -1))
+        self.lost = int(steps[-1]) + max(self.lost, -int(steps.min()))
+        self.reordered += reordered
+        self._maxSeq = max(self._maxSeq, int(seqs.max()))
+        self.received += len(seqs)
+        if sendTimes is not None and recvTimes is not None:
+            self.latency.recordMany(np.asarray(recvTimes) - np.asarray(sendTimes))
+
+
+    def summary(self):
+        return {"received": self.received, "lost": self.lost, "reordered": self.reordered, "latency": self.latency.summary()}
+
+
+
+class SuberBase:
+    """
+        Suber和AsyncSuber共用的接收和解码逻辑, 不依赖线程和事件循环
+
+        子类创建self._socket(同步socket)后调用_recvOne/_recvBatch, 通过_publishMessage/_publishBatch交付结果
+    """
+
+    SPLIT_CHAR = ","
+    HWM = 100       # SUB端最多缓存的消息数, 超出后丢弃
+
+    def _setup(self, address, topic="", batch=False, batchSize=None, batchTime=None, columns=None, decode=False,
+               delimiter=SPLIT_CHAR, dtype=np.float64, wireFormat: BinaryFormat=None, header=False, timeBase="local", hwm=HWM):
+        self._hwm = hwm
+        self._addresses = [address] if isinstance(address, str) else list(address)
+        self._topics = [topic] if isinstance(topic, str) else list(topic)
+        self._address = ",".join(self._addresses)
+        self._topic = ",".join(self._topics)
+        # 按长度降序匹配topic前缀, 保证最长匹配
+        self._topicMatch = [(t, t.encode()) for t in sorted(self._topics, key=len, reverse=True)]
+        self._batch = batch or batchSize is not None or batchTime is not None
+        self._batchSize = batchSize
+        self._batchTime = batchTime
+        if isinstance(columns, dict):
+            self._columns = {t: list(names) for t, names in columns.items()}
+        else:
+            self._columns = list(columns) if columns is not None else None
+        self._decode = decode or columns is not None
+        self._delimiter = delimiter
+        self._dtype = dtype
+        self._wireFormat = wireFormat
+        self._header = wireFormat.header if wireFormat is not None else header
+        self._decode = self._decode or self._header
+        self._publisherTime = timeBase == "publisher"
+        self._firstSendT = None
+        self._wallOffset = time.time() - time.perf_counter()     # 将perf_counter换算为time.time()
+        self.sequences = {}     # 每个topic的发布端各自编号, 分别统计
+
+        self._message = None
+        self._firstRecvT = None
+        self._lastRecvT = None
+        self._interval = 0
+        self._timestamp = 0
+        self._totalTime = 0
+
+        self._rtMsg = None
+
+        self.stats = PipelineStats()
+        self.count = 0          # 累计接收的消息数
+        self.malformed = 0      # 无法解码而丢弃的消息数(二进制帧长度不正确, 或文本的列数不足)
+
+
+    def _subscribe(self, socket):
+        # HWM只对之后的connect生效, 必须在connect之前设置
+        socket.set_hwm(self._hwm)
+        for addr in self._addresses:
+            socket.connect(addr)
+        for t in self._topics:
+            socket.setsockopt_string(zmq.SUBSCRIBE, t)
+
+
+    def _publishMessage(self, rtMsg: RTMessage):
+        raise NotImplementedError
+
+
+    def _publishBatch(self, batch: RTBatch):
+        raise NotImplementedError
+
+
+    def _stamp(self):
+        """记录本次消息到达的时间"""
+        t = time.perf_counter()
+        if self._firstRecvT is None:
+            self._firstRecvT = self._lastRecvT = t
+        self._interval = t - self._lastRecvT
+        self._timestamp = self._lastRecvT = t
+        self._totalTime = t - self._firstRecvT
+
+
+    def _sequenceTracker(self, topic):
+        tracker = self.sequences.get(topic)
+        if tracker is None:
+            tracker = self.sequences[topic] = SequenceTracker()
+        return tracker
+
+
+    @property
+    def sequence(self):
+        """只订阅一个topic时的序号统计"""
+        return self._sequenceTracker(self._topics[0])
+
+
+    def _matchTopic(self, data):
+        """返回data开头最长匹配的已订阅topic"""
+        index = 0 if isinstance(data, str) else 1
+        for match in self._topicMatch:
+            if data.startswith(match[index]):
+                return match[0]
+        return None
+
+
+    def _recv(self):
+        """
+            接收一条消息, 返回(topic, 消息), 没有数据时抛出zmq.Again
+
+            文本格式的消息为str, 二进制格式为记录数组, 该数组直接引用zmq帧的内存, 帧长度不正确时消息为None并计入malformed.
+            二进制格式下如果带有topic, 可以使用[topic, payload]两帧发送, 也可以将topic作为payload的前缀
+        """
+        if self._wireFormat is None:
+            message = self._socket.recv_string(flags=zmq.NOBLOCK)
+            return self._matchTopic(message), message
+        frame = self._socket.recv(flags=zmq.NOBLOCK, copy=False)
+        offset = 0
+        if frame.more:
+            # 与文本消息一致, 按最长匹配的已订阅前缀确定topic
+            topic = self._matchTopic(frame.bytes)
+            frame = self._socket.recv(copy=False)
+        else:
+            topic = self._matchTopic(bytes(frame.buffer[:len(self._topicMatch[0][1])]))
+            offset = len(topic) if topic else 0
+        records = self._wireFormat.decode(frame.buffer, offset)
+        if records is None:
+            self.malformed += 1
+        return topic, records
+
+
+    def _recvOne(self):
+        """接收一条消息, 没有数据时返回False"""
+        t = time.perf_counter()
+        try:
+            topic, message = self._recv()
+        except zmq.Again:
+            return False
+        if message is None:
+            return True
+        self._stamp()
+        self.stats.record("recv", self._timestamp - t)
+        self._message = message
+
+        if self._wireFormat is not None:
+            # 一帧中可能包含多条记录, 每条记录单独发送
+            for i, values in enumerate(message["values"]):
+                seq = sendTime = None
+                if self._header:
+                    seq, sendTime = int(message["seq"][i]), float(message["stamp"][i])
+                self._emitOne(topic, message, values, seq, sendTime)
+        else:
+            values = seq = sendTime = None
+            if self._decode:
+                values = self._decodeRow(message, topic)
+                self.stats.record("decode", time.perf_counter() - self._timestamp)
+                if (values is None and self._header) or (values is not None and len(values) < self._rowWidth(topic)):
+                    # 缺少序号和时间戳或列数不足的行无法使用, 丢弃并计数, 不影响接收线程
+                    self.malformed += 1
+                    return True
+                if self._header:
+                    seq, sendTime, values = int(values[0]), float(values[1]), values[2:]
+            self._emitOne(topic, message, values, seq, sendTime)
+        return True
+
+
+    def _emitOne(self, topic, message, values, seq, sendTime):
+        totalTime = self._totalTime
+        if seq is not None:
+            self._sequenceTracker(topic).update(seq, sendTime, self._timestamp + self._wallOffset)
+            if self._publisherTime:
+                if self._firstSendT is None:
+                    self._firstSendT = sendTime
+                totalTime = sendTime - self._firstSendT
+        self._rtMsg = RTMessage(timestamp=self._timestamp, totalTime=totalTime, message=message, values=values, seq=seq, sendTime=sendTime, topic=topic)
+        self._publishMessage(self._rtMsg)
+        self.count += 1
+
+
+    def _recvBatch(self):
+        """取出当前所有待处理的消息(受batchSize和batchTime限制), 按topic分组, 每组合并为一次信号发送, 返回接收的消息数"""
+        groups = {}
+        received = 0
+        deadline = None if self._batchTime is None else time.perf_counter() + self._batchTime
+        while self._batchSize is None or received < self._batchSize:
+            t = time.perf_counter()
+            try:
+                topic, message = self._recv()
+            except zmq.Again:
+                break
+            if message is None:
+                continue
+            self._stamp()
+            self.stats.record("recv", self._timestamp - t)
+            group = groups.get(topic)
+            if group is None:
+                group = groups[topic] = ([], [], [])
+            group[0].append(self._timestamp)
+            group[1].append(self._totalTime)
+            group[2].append(message)
+            received += 1
+            self._message = message
+            if deadline is not None and self._timestamp >= deadline:
+                break
+        for topic, (timestamps, totalTimes, messages) in groups.items():
+            self._emitBatch(topic, timestamps, totalTimes, messages)
+        return received
+
+
+    def _emitBatch(self, topic, timestamps, totalTimes, messages):
+        seqs = sendTimes = None
+        if self._wireFormat is not None:
+            # 二进制格式每帧可能包含多条记录, 时间戳按记录数展开
+            counts = [len(records) for records in messages]
+            messages = messages[0] if len(messages) == 1 else np.concatenate(messages)
+            values = messages["values"]
+            timestamps = np.repeat(timestamps, counts)
+            totalTimes = np.repeat(totalTimes, counts)
+            if self._header:
+                seqs, sendTimes = messages["seq"], messages["stamp"]
+        else:
+            values = None
+            if self._decode:
+                t = time.perf_counter()
+                values, keep = self._decodeBlock(messages, topic)
+                self.stats.record("decode", time.perf_counter() - t)
+                if keep is not None:
+                    # 只丢弃无法解码的行, 其余行的时间戳保持对应
+                    self.malformed += int(np.count_nonzero(~keep))
+                    if values is None:
+                        return
+                    timestamps = np.asarray(timestamps)[keep]
+                    totalTimes = np.asarray(totalTimes)[keep]
+                    messages = [m for m, k in zip(messages, keep) if k]
+                if values.shape[1] < self._rowWidth(topic):
+                    self.malformed += len(messages)
+                    return
+                if self._header:
+                    seqs, sendTimes, values = values[:, 0].astype(np.int64), values[:, 1], values[:, 2:]
+
+        timestamps = np.asarray(timestamps)
+        totalTimes = np.asarray(totalTimes)
+        if seqs is not None:
+            self._sequenceTracker(topic).updateMany(seqs, sendTimes, timestamps + self._wallOffset)
+            if self._publisherTime:
+                if self._firstSendT is None:
+                    self._firstSendT = float(sendTimes[0])
+                totalTimes = sendTimes - self._firstSendT
+
+        batch = RTBatch(timestamps=timestamps, totalTimes=totalTimes, messages=messages, values=values, seqs=seqs, sendTimes=sendTimes, topic=topic)
+        self._publishBatch(batch)
+        self.count += len(batch)
+
+
+    def _payload(self, message, topic):
+        """去掉消息开头的topic"""
+        if topic:
+            message = message[len(topic):].lstrip(self._delimiter + " ")
+        return message
+
+
+    def _rowWidth(self, topic):
+        """解码后每行至少需要的列数: 设置columns时为列名的个数, 带头部时再加上序号和时间戳两列"""
+        columns = self._columns.get(topic) if isinstance(self._columns, dict) else self._columns
+        return (len(columns) if columns is not None else 0) + (2 if self._header else 0)
+
+
+    def _decodeRow(self, message, topic=None):
+        try:
+            return np.array(self._payload(message, topic).split(self._delimiter), dtype=self._dtype)
+        except ValueError:
+            return None
+
+
+    def _decodeBlock(self, messages, topic=None):
+        """
+            将一批消息拼接后一次解码为(消息数, 列数)的数组, 返回(数组, 保留的行), 全部保留时保留的行为None
+
+            拼接后无法区分消息的边界, 因此先按分隔符的个数检查每条消息的列数都相同, 设置了columns时还要求与列名的个数一致.
+            检查不通过时逐条解码, 只丢弃无法解析或列数与其余行不一致的行, 全部丢弃时数组为None
+        """
+        payloads = [self._payload(m, topic) for m in messages]
+        columns = self._columns.get(topic) if isinstance(self._columns, dict) else self._columns
+        width = self._rowWidth(topic) if columns is not None else None
+        separators = payloads[0].count(self._delimiter)
+        if all(p.count(self._delimiter) == separators for p in payloads) and width in (None, separators + 1):
+            try:
+                values = np.fromstring(self._delimiter.join(payloads), dtype=self._dtype, sep=self._delimiter)
+            except ValueError:
+                values = None
+            if values is not None and values.size == len(payloads) * (separators + 1):
+                return values.reshape(len(payloads), -1), None
+
+        rows = [self._decodeRow(p) for p in payloads]
+        widths = np.array([len(row) if row is not None else 0 for row in rows])
+        if width is None:
+            # 未设置columns时以最多的列数为准
+            width = int(np.bincount(widths).argmax()) if widths.any() else 0
+        keep = (widths == width) & (widths > 0)
+        if not keep.any():
+            return None, keep
+        return np.stack([row for row, k in zip(rows, keep) if k]), keep
+
+
+    @property
+    def columns(self):
+        return self._columns
+
+
+    def columnIndex(self, column, topic=None):
+        """将列名或列序号转换为列序号, columns按topic区分时需要指定topic"""
+        if isinstance(column, str):
+            columns = self._columns.get(topic) if isinstance(self._columns, dict) else self._columns
+            if columns is None or column not in columns:
+                raise KeyError(f"Unknown column {column} for topic {topic}, available columns: {columns}")
+            return columns.index(column)
+        return int(column)
+
+
+
+class Suber(QThread, SuberBase):
+
+    POLL_TIMEOUT = 100      # 阻塞等待数据的超时时间(ms), 决定stop()的最长响应时间
+    SUMMARY_INTERVAL = 1.0  # verbose模式下输出统计信息的间隔(s)
+    rtMsgSignal = pyqtSignal(RTMessage)
+    rtBatchSignal = pyqtSignal(object)
+
+    def __init__(self, address, topic="", pollTimeout=POLL_TIMEOUT, busyPoll=False, batch=False, batchSize=None, batchTime=None,
+                 columns=None, decode=False, delimiter=SuberBase.SPLIT_CHAR, dtype=np.float64, wireFormat: BinaryFormat=None, verbose=False,
+                 header=False, timeBase="local", hwm=SuberBase.HWM):
+        """
+
+        Args:
+            address (str | list): zmq PUB的地址, 多个地址时同一个socket连接所有的PUB
+            topic (str | list, optional): 订阅的topic, 多个topic时每条消息按最长匹配的前缀确定所属的topic(RTMessage.topic). Defaults to "".
+            pollTimeout (int, optional): Poller阻塞等待的超时时间(ms). Defaults to POLL_TIMEOUT.
+            busyPoll (bool, optional): 使用NOBLOCK忙轮询接收, 延时最低但会占满一个CPU核心. Defaults to False.
+            batch (bool, optional): 批量模式, 每次唤醒取出所有待处理的消息, 每个topic通过rtBatchSignal发送一个RTBatch. Defaults to False.
+            batchSize (int, optional): 批量模式下每批最多的消息数, None表示不限制. Defaults to None.
+            batchTime (float, optional): 批量模式下每批最长的接收时间(s), None表示不限制. Defaults to None.
+            columns (list | dict, optional): 每列数据的名称, 不同topic的列不同时使用{topic: 列名}, 设置后自动开启解码, 子窗口可以直接按名称绑定列. Defaults to None.
+            decode (bool, optional): 接收时将数据按delimiter一次性解码为NumPy数组(RTMessage.values). Defaults to False.
+            delimiter (str, optional): 数据的分隔符. Defaults to SPLIT_CHAR.
+            dtype (optional): 解码后的数据类型. Defaults to np.float64.
+            wireFormat (BinaryFormat, optional): 二进制数据格式, 设置后以copy=False接收并直接将帧映射为NumPy数组. Defaults to None.
+            verbose (bool, optional): 每SUMMARY_INTERVAL秒输出一次接收速率和耗时统计. Defaults to False.
+            header (bool, optional): 文本格式下解码后的前两列为发布端的序号和发送时间戳, 二进制格式由BinaryFormat.header决定. Defaults to False.
+            timeBase (str, optional): "local"时totalTime为本地接收时间, "publisher"时为发布端的发送时间, 可以去除接收时的抖动. Defaults to "local".
+            hwm (int, optional): SUB端的HWM, 在连接之前设置. Defaults to SuberBase.HWM.
+        """
+        super().__init__()
+        self._setup(address, topic, batch, batchSize, batchTime, columns, decode, delimiter, dtype, wireFormat, header, timeBase, hwm)
+        self._pollTimeout = pollTimeout
+        self._busyPoll = busyPoll
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.SUB)
+        self._subscribe(self._socket)
+        self._stop_event = Event()
+
+        self._verbose = verbose
+        self._summaryT = None
+        self._summaryCount = 0
+        
+
+
+    def run(self):
+        print(f"Subscriber started, listening to {self._topic} on {self._address}")
+        poller = zmq.Poller()
+        poller.register(self._socket, zmq.POLLIN)
+        while not self._stop_event.is_set():
+            # 阻塞在Poller上等待数据, 空闲时不占用CPU, 超时后检查停止标志
+            if not self._busyPoll and not poller.poll(self._pollTimeout):
+                continue
+            if self._batch:
+                self._recvBatch()
+            else:
+                self._recvOne()
+            if self._verbose:
+                self._summary()
+
+
+    def _summary(self):
+        """按SUMMARY_INTERVAL输出接收速率和耗时统计, 代替逐条消息的输出"""
+        now = time.perf_counter()
+        if self._summaryT is None:
+            self._summaryT = now
+            self._summaryCount = self.count
+            return
+        if now - self._summaryT < self.SUMMARY_INTERVAL:
+            return
+        rate = (self.count - self._summaryCount) / (now - self._summaryT)
+        recv = self.stats.snapshot().get("recv", {})
+        print(f"Subscriber {self._topic}@{self._address}: {self.count} messages | {rate:.1f} msg/s | "
+              f"recv p50 {recv.get('p50Us', 0):.1f}us p99 {recv.get('p99Us', 0):.1f}us")
+        self._summaryT = now
+        self._summaryCount = self.count
+
+
+    def _publishMessage(self, rtMsg):
+        self.rtMsgSignal.emit(rtMsg)
+
+
+    def _publishBatch(self, batch):
+        self.rtBatchSignal.emit(batch)
+
+    
+    def stop(self):
+        self._stop_event.set()
+        # 等待接收线程退出后再关闭socket, 避免跨线程使用socket
+        self.wait()
+        self._socket.close()
+        self._context.term()
+        print("Subscriber stopped")
+
+
+    
+    def connect(self, slot):
+        self.rtMsgSignal.connect(slot)
+
+
+    def connectBatch(self, slot):
+        self.rtBatchSignal.connect(slot)
+
+
+
+class AsyncSuber(SuberBase):
+    """
+        基于zmq.asyncio的订阅端, 解码和统计与Suber相同, 作为异步迭代器使用, 不依赖Qt, 可以直接用于异步服务和无界面的记录
+
+        async for rtMsg in AsyncSuber("tcp://127.0.0.1:5555", columns=["x", "y", "z"]):
+            ...
+        async for batch in AsyncSuber("tcp://127.0.0.1:5555", batch=True):
+            ...
+
+        只通过asyncio socket等待数据, 数据到达后使用同一socket的同步shadow取出, 不需要为每条消息创建Future
+    """
+
+    def __init__(self, address, topic="", batch=False, batchSize=None, batchTime=None, columns=None, decode=False,
+                 delimiter=SuberBase.SPLIT_CHAR, dtype=np.float64, wireFormat: BinaryFormat=None, header=False, timeBase="local", hwm=SuberBase.HWM,
+                 context=None):
+        """
+        参数与Suber相同
+
+        Args:
+            context (zmq.asyncio.Context, optional): 多个AsyncSuber可以共用一个Context. Defaults to zmq.asyncio.Context.instance().
+        """
+        self._setup(address, topic, batch, batchSize, batchTime, columns, decode, delimiter, dtype, wireFormat, header, timeBase, hwm)
+        self._context = context if context is not None else zmq.asyncio.Context.instance()
+        self._asyncSocket = self._context.socket(zmq.SUB)
+        self._subscribe(self._asyncSocket)
+        self._socket = zmq.Socket.shadow(self._asyncSocket.underlying)
+        self._pending = deque()
+
+
+    def _publishMessage(self, rtMsg):
+        self._pending.append(rtMsg)
+
+
+    def _publishBatch(self, batch):
+        self._pending.append(batch)
+
+
+    async def recv(self):
+        """等待并返回下一个RTMessage, 批量模式下返回RTBatch"""
+        while not self._pending:
+            await self._asyncSocket.poll(flags=zmq.POLLIN)
+            # 一次唤醒取出所有已到达的消息, 之后的recv直接从_pending返回
+            if self._batch:
+                self._recvBatch()
+            else:
+                while self._recvOne():
+                    pass
+        return self._pending.popleft()
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        return await self.recv()
+
+
+    async def record(self, recorder, x="totalTime"):
+        """
+            将解码后的每一列写入Recorder, 通道名为列名(多个topic时为"topic/列名"), 直到任务被取消
+
+        Args:
+            recorder (Recorder): 记录器
+            x (str, optional): 横坐标, "totalTime"或"timestamp". Defaults to "totalTime".
+        """
+        async for item in self:
+            values = item.values
+            if values is None:
+                continue
+            xs = getattr(item, x + "s" if isinstance(item, RTBatch) else x)
+            columns = self._columns.get(item.topic) if isinstance(self._columns, dict) else self._columns
+            prefix = f"{item.topic}/" if len(self._topics) > 1 else ""
+            for i in range(values.shape[-1]):
+                name = columns[i] if columns is not None and i < len(columns) else str(i)
+                recorder.append(prefix + name, xs, values[..., i])
+
+
+    def close(self):
+        self._asyncSocket.close()
+
+
+
+class AsyncBridge(QObject):
+    """
+        在Qt事件循环中定时运行asyncio事件循环, GUI线程中的多个异步数据源共用同一个事件循环, 不需要额外的线程
+
+        每次连续处理已就绪的回调和I/O, 直到没有就绪的回调或超出budget, 不会阻塞GUI; interval决定异步任务的最大响应延时
+    """
+
+    INTERVAL = 2    # ms
+    BUDGET = 0.005  # 每次定时运行事件循环的最长时间(s)
+
+    def __init__(self, interval=INTERVAL, loop=None, budget=BUDGET):
+        super().__init__()
+        self.loop = loop if loop is not None else asyncio.new_event_loop()
+        self._budget = budget
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._step)
+        self._timer.start(interval)
+
+
+    def _step(self):
+        deadline = time.perf_counter() + self._budget
+        while True:
+            self.loop.call_soon(self.loop.stop)
+            self.loop.run_forever()
+            # 本轮中被唤醒的任务会继续排入就绪队列, 处理完之前不等待下一次定时器
+            if not getattr(self.loop, "_ready", None) or time.perf_counter() >= deadline:
+                break
+
+
+    def run(self, coro):
+        """在事件循环中运行协程, 返回Task"""
+        return self.loop.create_task(coro)
+
+
+    def stop(self):
+        """取消所有任务后关闭事件循环"""
+        self._timer.stop()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+
+
+class AsyncSource(QObject):
+    """将AsyncSuber适配为Suber的接口, 由AsyncBridge驱动, 可以直接作为RealTimePlot的数据源"""
+
+    rtMsgSignal = pyqtSignal(RTMessage)
+    rtBatchSignal = pyqtSignal(object)
+
+    def __init__(self, suber: AsyncSuber, bridge: AsyncBridge):
+        super().__init__()
+        self._suber = suber
+        self._bridge = bridge
+        self._task = None
+
+
+    async def _forward(self):
+        async for item in self._suber:
+            if isinstance(item, RTBatch):
+                self.rtBatchSignal.emit(item)
+            else:
+                self.rtMsgSignal.emit(item)
+
+
+    def start(self):
+        self._task = self._bridge.run(self._forward())
+
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._suber.close()
+
+
+    @property
+    def stats(self):
+        return self._suber.stats
+
+
+    @property
+    def count(self):
+        return self._suber.count
+
+
+    @property
+    def sequences(self):
+        return self._suber.sequences
+
+
+    @property
+    def columns(self):
+        return self._suber.columns
+
+
+    def columnIndex(self, column, topic=None):
+        return self._suber.columnIndex(column, topic)
+
+
+    def connect(self, slot):
+        self.rtMsgSignal.connect(slot)
+
+
+    def connectBatch(self, slot):
+        self.rtBatchSignal.connect(slot)
+
+
+
+
+class SharedRing:
+    """
+        基于multiprocessing.shared_memory的单写单读环形缓冲区, 每行为width个float64
+
+        头部保存两个累计行数: 开始写入的行数和写入完成的行数. 写入端先更新开始写入的行数, 再写数据, 最后更新写入完成的行数;
+        读取端只复制写入完成的行, 复制后按开始写入的行数丢弃复制期间可能被覆盖的行(包括正在写入的), 因此两端都不需要加锁
+    """
+
+    HEADER_SIZE = 64
+
+    def __init__(self, capacity, width, name=None, create=True):
+        self._capacity = int(capacity)
+        self._width = int(width)
+        size = self.HEADER_SIZE + self._capacity * self._width * 8
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        # _count[0]为写入完成的行数, _count[1]为开始写入的行数
+        self._count = np.ndarray((2,), dtype=np.uint64, buffer=self._shm.buf[:16])
+        self._data = np.ndarray((self._capacity, self._width), dtype=np.float64, buffer=self._shm.buf[self.HEADER_SIZE:size])
+        if create:
+            self._count[:] = 0
+        self._read = 0
+        self.overflow = 0       # 读取不及时被覆盖的行数
+
+
+    @property
+    def name(self):
+        return self._shm.name
+
+
+    def write(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self._width)
+        cap = self._capacity
+        start = int(self._count[0])
+        n = len(rows)
+        if n > cap:
+            rows = rows[-cap:]
+        # 先公布本次写入的范围, 读取端据此判断哪些行可能正在被覆盖
+        self._count[1] = start + n
+        i = (start + n - len(rows)) % cap
+        first = min(len(rows), cap - i)
+        self._data[i:i + first] = rows[:first]
+        self._data[:len(rows) - first] = rows[first:]
+        self._count[0] = start + n
+
+
+    def read(self):
+        """返回上次读取之后写入的所有行, 没有新数据时返回None"""
+        cap = self._capacity
+        end = int(self._count[0])
+        start = self._read
+        if end - start > cap:
+            self.overflow += end - start - cap
+            start = end - cap
+        if start >= end:
+            return None
+        i, j = start % cap, end % cap
+        if i < j:
+            rows = self._data[i:j].copy()
+        else:
+            rows = np.concatenate((self._data[i:], self._data[:j]))
+        # 复制期间写入端可能已经开始覆盖最早的几行
+        writeEnd = int(self._count[1])
+        if writeEnd - cap > start:
+            drop = min(writeEnd - cap - start, len(rows))
+            rows = rows[drop:]
+            self.overflow += drop
+        self._read = end
+        return rows if len(rows) else None
+
+
+    def close(self, unlink=False):
+        del self._count, self._data
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+
+def _processReceiver(ringName, capacity, width, address, kwargs, stopEvent):
+    """ProcessSuber的接收进程: 使用批量模式的Suber接收和解码, 结果写入共享内存"""
+    ring = SharedRing(capacity, width, name=ringName, create=False)
+    suber = Suber(address, batch=True, **kwargs)
+
+    def write(batch):
+        if batch.values is None:
+            return
+        rows = np.empty((len(batch), width))
+        rows[:, 0] = batch.timestamps
+        rows[:, 1] = batch.totalTimes
+        rows[:, 2:] = batch.values
+        ring.write(rows)
+
+    suber.connectBatch(write)
+    Thread(target=lambda: (stopEvent.wait(), suber._stop_event.set()), daemon=True).start()
+    suber.run()
+    suber.stop()
+    ring.close()
+
+
+
+class ProcessSuber(QObject):
+    """
+        在独立的进程中接收和解码数据, 通过共享内存环形缓冲区交给GUI进程
+
+        接收进程不与Qt绘图共享GIL, 重绘耗时较长时也不会因为来不及接收而触发HWM丢包.
+        RealTimePlot在每一帧重绘之前调用poll()读取新数据, 以RTBatch的形式交给子窗口.
+        其余参数与Suber一致(固定为批量模式, 不支持按topic分发), channels为解码后每条消息的列数, 未指定时由columns或wireFormat确定
+
+        suber = ProcessSuber("tcp://127.0.0.1:5556", columns=["x", "y", "z"])
+
+        接收进程以spawn方式启动, 脚本需要放在if __name__ == '__main__'中
+    """
+
+    DEFAULT_CAPACITY = 1 << 16      # 共享内存中保存的行数, 应大于两帧之间接收的数据量
+    rtMsgSignal = pyqtSignal(RTMessage)
+    rtBatchSignal = pyqtSignal(object)
+
+    def __init__(self, address, channels=None, capacity=DEFAULT_CAPACITY, **kwargs):
+        super().__init__()
+        columns = kwargs.get("columns")
+        wireFormat = kwargs.get("wireFormat")
+        if channels is None:
+            if wireFormat is not None:
+                channels = wireFormat.channels
+            elif columns is not None and not isinstance(columns, dict):
+                channels = len(columns)
+            else:
+                raise ValueError("channels must be given when neither columns nor wireFormat is set")
+        self._columns = list(columns) if columns is not None and not isinstance(columns, dict) else None
+        self._ring = SharedRing(capacity, channels + 2)
+        ctx = mp.get_context("spawn")
+        self._stopEvent = ctx.Event()
+        self._process = ctx.Process(target=_processReceiver, args=(self._ring.name, capacity, channels + 2, address, kwargs, self._stopEvent),
+                                    name="ProcessSuber", daemon=True)
+        self.stats = PipelineStats()
+        self.count = 0
+
+
+    @property
+    def overflow(self):
+        return self._ring.overflow
+
+
+    def start(self):
+        self._process.start()
+
+
+    def stop(self):
+        self._stopEvent.set()
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._ring.close(unlink=True)
+        print("Subscriber stopped")
+
+
+    def poll(self):
+        """读取接收进程写入的新数据并发送rtBatchSignal"""
+        t = time.perf_counter()
+        rows = self._ring.read()
+        if rows is None:
+            return
+        self.stats.record("read", time.perf_counter() - t)
+        batch = RTBatch(timestamps=rows[:, 0], totalTimes=rows[:, 1], messages=rows, values=rows[:, 2:])
+        self.rtBatchSignal.emit(batch)
+        self.count += len(rows)
+
+
+    @property
+    def columns(self):
+        return self._columns
+
+
+    def columnIndex(self, column, topic=None):
+        if isinstance(column, str):
+            if self._columns is None or column not in self._columns:
+                raise KeyError(f"Unknown column {column}, available columns: {self._columns}")
+            return self._columns.index(column)
+        return int(column)
+
+
+    def connect(self, slot):
+        self.rtMsgSignal.connect(slot)
+
+
+    def connectBatch(self, slot):
+        self.rtBatchSignal.connect(slot)
+
+
+
+
+class Replayer(QThread):
+    """
+        回放记录的数据, 接口与Suber一致, 可以直接替换Suber传入RealTimePlot
+
+        支持PlotSubWindow.save_data/RealTimePlot.save_all_data保存的CSV(第一列为时间, 其余列为数据)
+        以及Recorder记录的目录(各通道按时间合并, 缺失的数据沿用上一个值).
+        speed为1时按原始速度回放, 为N时N倍速回放, 为None或0时不等待, 以最快速度回放, 可以作为绘图流程的吞吐量测试.
+        最快速度回放时固定为批量模式, 每批等待GUI线程处理完上一批后再发送, 信号队列中不会积压数据
+
+        replayer = Replayer("20240825_record", speed=2, batch=True)
+        rtPlot = RealTimePlot("Replay", 16, replayer)
+        rtPlot.addSubWindow(title="X2", callback="X2", row=1, col=1)
+    """
+
+    FAST_BATCH_SIZE = 1000      # 最快速度回放时每批的数据量
+    ACK_TIMEOUT = 0.1           # 等待GUI线程处理上一批时检查停止标志的间隔(s)
+    rtMsgSignal = pyqtSignal(RTMessage)
+    rtBatchSignal = pyqtSignal(object)
+
+    def __init__(self, path, speed=1.0, batch=False, batchSize=None):
+        super().__init__()
+        self._path = path
+        self._speed = speed
+        self._batch = batch or batchSize is not None or not speed
+        self._batchSize = batchSize if batchSize is not None else (None if speed else self.FAST_BATCH_SIZE)
+        self._times, self._values, self._columns = self.loadSession(path)
+        self._stop_event = Event()
+        self._consumed = Event()
+        self.count = 0          # 累计回放的数据数
+
+
+    @staticmethod
+    def loadSession(path):
+        """读取记录, 返回(时间, shape为(n, 列数)的数据, 列名)"""
+        if os.path.isdir(path):
+            channels = Recorder.load(path)
+            columns = list(channels.keys())
+            times = np.unique(np.concatenate([data[:, 0] for data in channels.values()]))
+            values = np.full((len(times), len(columns)), np.nan)
+            for i, data in enumerate(channels.values()):
+                if len(data) == 0:
+                    continue
+                index = np.searchsorted(data[:, 0], times, side="right") - 1
+                valid = index >= 0
+                values[valid, i] = data[index[valid], 1]
+            return times, values, columns
+
+        with open(path) as f:
+            header = f.readline().strip().split(",")
+        data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+        return data[:, 0], data[:, 1:], header[1:]
+
+
+    @property
+    def columns(self):
+        return self._columns
+
+
+    def columnIndex(self, column, topic=None):
+        if isinstance(column, str):
+            if column not in self._columns:
+                raise KeyError(f"Unknown column {column}, available columns: {self._columns}")
+            return self._columns.index(column)
+        return int(column)
+
+
+    def _ack(self, batch):
+        self._consumed.set()
+
+
+    def _waitConsumed(self):
+        while not self._consumed.wait(self.ACK_TIMEOUT):
+            if self._stop_event.is_set():
+                return
+
+
+    def run(self):
+        print(f"Replayer started, replaying {len(self._times)} samples from {self._path}")
+        # 在回放线程启动后连接, 排在RealTimePlot等已连接的槽之后, 在GUI线程中处理完该批数据后才会调用
+        if not self._speed:
+            self.rtBatchSignal.connect(self._ack)
+        times, values = self._times, self._values
+        n = len(times)
+        i = 0
+        t0 = time.perf_counter()
+        while i < n and not self._stop_event.is_set():
+            if self._speed:
+                # 计算当前应该回放到的记录时间
+                due = times[0] + (time.perf_counter() - t0) * self._speed
+                end = int(np.searchsorted(times, due, side="right"))
+                if end <= i:
+                    time.sleep(min((times[i] - due) / self._speed, 0.01))
+                    continue
+            else:
+                end = n
+
+            if self._batch:
+                if self._batchSize is not None:
+                    end = min(end, i + self._batchSize)
+                timestamps = np.full(end - i, time.perf_counter())
+                self._consumed.clear()
+                self.rtBatchSignal.emit(RTBatch(timestamps=timestamps, totalTimes=times[i:end], messages=values[i:end], values=values[i:end]))
+                self.count += end - i
+                if not self._speed:
+                    self._waitConsumed()
+            else:
+                for j in range(i, end):
+                    if self._stop_event.is_set():
+                        break
+                    self.rtMsgSignal.emit(RTMessage(timestamp=time.perf_counter(), totalTime=times[j], message=values[j], values=values[j]))
+                    self.count += 1
+            i = end
+        if not self._speed:
+            self.rtBatchSignal.disconnect(self._ack)
+        print("Replayer finished")
+
+
+    def stop(self):
+        self._stop_event.set()
+        self.wait()
+
+
+    def connect(self, slot):
+        self.rtMsgSignal.connect(slot)
+
+
+    def connectBatch(self, slot):
+        self.rtBatchSignal.connect(slot)
+
+
+
+
+class Puber:
+    """
+        与Suber配套的发布端
+
+        puber = Puber("tcp://127.0.0.1:5556")                               # 文本格式, 与原有的send_string兼容
+        puber = Puber("tcp://127.0.0.1:5556", wireFormat=BinaryFormat(3))   # 二进制格式, 自动填充序号和发送时间戳
+        puber.send([x, y, z])
+    """
+
+    def __init__(self, address, topic="", wireFormat: BinaryFormat=None, hwm=100, delimiter=Suber.SPLIT_CHAR, header=False):
+        """
+
+        Args:
+            header (bool, optional): 文本格式下在数据前添加序号和发送时间戳, 对应Suber的header参数. Defaults to False.
+        """
+        self._topic = topic
+        self._header = header
+        self._wireFormat = wireFormat
+        self._delimiter = delimiter
+        self._context = zmq.Context()
+        self._socket = self._context.socket(zmq.PUB)
+        self._socket.set_hwm(hwm)
+        self._socket.bind(address)
+        self._seq = 0
+
+
+    def send(self, values):
+        """发送一行数据"""
+        if self._wireFormat is None:
+            if self._header:
+                values = [self._seq, repr(time.time()), *values]
+                self._seq += 1
+            message = self._delimiter.join(map(str, values))
+            if self._topic:
+                message = f"{self._topic} {message}"
+            self._socket.send_string(message)
+        else:
+            self.sendMany([values])
+
+
+    def sendMany(self, rows, stamps=None):
+        """
+            二进制格式下将多行数据打包在一帧中发送, 文本格式下逐行发送
+
+            stamps为每行数据的采样时间(time.time()), 默认为发送时间
+        """
+        if self._wireFormat is None:
+            for values in rows:
+                self.send(values)
+            return
+        rows = np.asarray(rows).reshape(-1, self._wireFormat.channels)
+        payload = self._wireFormat.encode(rows, seq=self._seq, stamp=time.time() if stamps is None else stamps)
+        self._seq += len(rows)
+        if self._topic:
+            self._socket.send_multipart([self._topic.encode(), payload])
+        else:
+            self._socket.send(payload)
+
+
+    def close(self):
+        self._socket.close()
+        self._context.term()
+
+
+
+
+class RingBuffer:
+    """
+        固定容量的float64环形缓冲区, width不为None时每个数据为一行width个值
+
+        内部按两倍容量分配, 每个数据同时写入i和i+capacity两个位置,
+        因此最近写入的数据在内存中始终是连续的, view()直接返回切片视图, 不需要拷贝和重新分配
+    """
+
+    def __init__(self, capacity: int, width: int=None):
+        self._capacity = max(int(capacity), 1)
+        shape = 2 * self._capacity if width is None else (2 * self._capacity, width)
+        self._data = np.zeros(shape, dtype=np.float64)
+        self._index = 0     # 下一次写入的位置
+        self._size = 0      # 当前有效数据个数
+        self._total = 0     # 累计写入的数据个数
+
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+
+    @property
+    def total(self):
+        return self._total
+
+
+    def __len__(self):
+        return self._size
+
+
+    def append(self, value):
+        i = self._index
+        self._data[i] = value
+        self._data[i + self._capacity] = value
+        self._index = (i + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+        self._total += 1
+
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        cap = self._capacity
+        if n >= cap:
+            # 超过容量时只保留最新的capacity个数据
+            self._data[:cap] = values[-cap:]
+            self._data[cap:] = values[-cap:]
+            self._index = 0
+        else:
+            i = self._index
+            first = min(n, cap - i)
+            self._data[i:i + first] = values[:first]
+            self._data[i + cap:i + cap + first] = values[:first]
+            rest = n - first
+            if rest:
+                self._data[:rest] = values[first:]
+                self._data[cap:cap + rest] = values[first:]
+            self._index = (i + n) % cap
+        self._size = min(self._size + n, cap)
+        self._total += n
+
+
+    def view(self):
+        """返回按写入顺序排列的有效数据视图(连续内存, 不拷贝)"""
+        end = self._index + self._capacity
+        return self._data[end - self._size:end]
+
+
+    def last(self):
+        return self._data[self._index + self._capacity - 1] if self._size else None
+
+
+    def clear(self):
+        self._index = 0
+        self._size = 0
+        self._total = 0
+
+
+
+
+class GrowableBuffer:
+    """容量按需倍增的float64缓冲区, 追加均摊O(1), view()返回连续视图"""
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.zeros(max(int(capacity), 1), dtype=np.float64)
+        self._size = 0
+
+
+    def __len__(self):
+        return self._size
+
+
+    def _reserve(self, size):
+        if size > len(self._data):
+            data = np.zeros(max(size, 2 * len(self._data)), dtype=np.float64)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        self._reserve(self._size + n)
+        self._data[self._size:self._size + n] = values
+        self._size += n
+
+
+    def view(self):
+        return self._data[:self._size]
+
+
+    def last(self):
+        return self._data[self._size - 1] if self._size else None
+
+
+    def clear(self):
+        self._size = 0
+
+
+
+
+class MinMaxDecimator:
+    """
+        增量维护的min/max抽取
+
+        数据按bucketSize个一组, 每组只保留最小值和最大值两个点(按时间先后输出), 因此峰值不会丢失.
+        组数达到2*maxBuckets时相邻两组合并且bucketSize翻倍, 输出的点数始终不超过4*maxBuckets+2
+    """
+
+    def __init__(self, maxBuckets: int = 1000):
+        self._maxBuckets = max(int(maxBuckets), 1)
+        self._buckets = np.zeros((2 * self._maxBuckets, 4), dtype=np.float64)     # minX, minY, maxX, maxY
+        self.clear()
+
+
+    @property
+    def maxBuckets(self):
+        return self._maxBuckets
+
+
+    def clear(self):
+        self._bucketSize = 1
+        self._count = 0         # 已完成的组数
+        self._partial = None    # 未满的组 [minX, minY, maxX, maxY]
+        self._partialCount = 0
+
+
+    def _commit(self, buckets):
+        """追加若干个已完成的组(不超过剩余容量), 容量满时两两合并"""
+        self._buckets[self._count:self._count + len(buckets)] = buckets
+        self._count += len(buckets)
+        if self._count == len(self._buckets):
+            self._merge()
+
+
+    @staticmethod
+    def _mergePairs(buckets):
+        left, right = buckets[0::2], buckets[1::2]
+        merged = left.copy()
+        useRightMin = right[:, 1] < left[:, 1]
+        useRightMax = right[:, 3] > left[:, 3]
+        merged[useRightMin, 0:2] = right[useRightMin, 0:2]
+        merged[useRightMax, 2:4] = right[useRightMax, 2:4]
+        return merged
+
+
+    def _merge(self):
+        self._buckets[:self._maxBuckets] = self._mergePairs(self._buckets)
+        self._count = self._maxBuckets
+        self._bucketSize *= 2
+
+
+    def push(self, x, y):
+        if self._partial is None:
+            self._partial = np.array([x, y, x, y], dtype=np.float64)
+        else:
+            if y < self._partial[1]:
+                self._partial[0:2] = x, y
+            if y > self._partial[3]:
+                self._partial[2:4] = x, y
+        self._partialCount += 1
+        if self._partialCount >= self._bucketSize:
+            partial = self._partial
+            self._partial = None
+            self._partialCount = 0
+            self._commit(partial[None, :])
+
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        # 先补满未完成的组
+        head = min(len(ys), self._bucketSize - self._partialCount) if self._partialCount else 0
+        for i in range(head):
+            self.push(xs[i], ys[i])
+        xs, ys = xs[head:], ys[head:]
+        while len(ys):
+            size = self._bucketSize
+            full = len(ys) // size
+            # 每次最多提交到容量上限, 之后组大小可能发生变化
+            full = min(full, len(self._buckets) - self._count)
+            if full == 0:
+                for i in range(len(ys)):
+                    self.push(xs[i], ys[i])
+                break
+            blockX = xs[:full * size].reshape(full, size)
+            blockY = ys[:full * size].reshape(full, size)
+            rows = np.arange(full)
+            iMin = blockY.argmin(axis=1)
+            iMax = blockY.argmax(axis=1)
+            self._commit(np.column_stack((blockX[rows, iMin], blockY[rows, iMin], blockX[rows, iMax], blockY[rows, iMax])))
+            xs, ys = xs[full * size:], ys[full * size:]
+
+
+    def points(self):
+        """返回抽取后的(x, y), 每组的最小值和最大值按x的先后顺序排列"""
+        buckets = self._buckets[:self._count]
+        if self._partial is not None:
+            buckets = np.vstack((buckets, self._partial))
+        minFirst = buckets[:, 0] <= buckets[:, 2]
+        x = np.empty(2 * len(buckets))
+        y = np.empty(2 * len(buckets))
+        x[0::2] = np.where(minFirst, buckets[:, 0], buckets[:, 2])
+        y[0::2] = np.where(minFirst, buckets[:, 1], buckets[:, 3])
+        x[1::2] = np.where(minFirst, buckets[:, 2], buckets[:, 0])
+        y[1::2] = np.where(minFirst, buckets[:, 3], buckets[:, 1])
+        return x, y
+
+
+
+
+class RunningExtrema:
+    """累计的最大值和最小值, 用于压缩窗口, 每次更新O(1)"""
+
+    def __init__(self):
+        self.max = None
+        self.min = None
+
+
+    def push(self, x, y):
+        if self.max is None:
+            self.max = self.min = y
+        elif y > self.max:
+            self.max = y
+        elif y < self.min:
+            self.min = y
+
+
+    def extend(self, xs, ys):
+        if len(ys) == 0:
+            return
+        self.push(None, np.max(ys))
+        self.push(None, np.min(ys))
+
+
+    def expire(self, xMin):
+        pass
+
+
+    def clear(self):
+        self.max = None
+        self.min = None
+
+
+
+class WindowExtrema:
+    """
+        基于单调队列的滑动窗口最大值和最小值, 每次更新均摊O(1)
+
+        队列中保存(序号, x, y), 数据按x(时间)滑出窗口, 同时不超过capacity个数据,
+        与RollWindow环形缓冲区的容量保持一致
+    """
+
+    def __init__(self, capacity=None):
+        self._capacity = capacity
+        self._maxQueue = deque()
+        self._minQueue = deque()
+        self._count = 0
+
+
+    @property
+    def max(self):
+        return self._maxQueue[0][2] if self._maxQueue else None
+
+
+    @property
+    def min(self):
+        return self._minQueue[0][2] if self._minQueue else None
 
-    while 1:
-        time.sleep(0.015)
-        s = f"{x},{y},{z}"
-        puber.send_string(s)
-"""
 
-"""
-    PUB&SUB
+    def push(self, x, y, low=None):
+        """low不为None时, 最大值按y跟踪, 最小值按low跟踪(多条曲线时分别为各通道的最大值和最小值)"""
+        low = y if low is None else low
+        maxQueue, minQueue = self._maxQueue, self._minQueue
+        while maxQueue and maxQueue[-1][2] <= y:
+            maxQueue.pop()
+        maxQueue.append((self._count, x, y))
+        while minQueue and minQueue[-1][2] >= low:
+            minQueue.pop()
+        minQueue.append((self._count, x, low))
+        self._count += 1
 
-    通信延时:
-        在本机通信的情况下,PUB和SUB设置HWM为100, 发送方0.015间隔,发送114个数据后接受方为1.710053 | 1.7101030349731445
+        if self._capacity is not None:
+            oldest = self._count - self._capacity
+            while maxQueue[0][0] < oldest:
+                maxQueue.popleft()
+            while minQueue[0][0] < oldest:
+                minQueue.popleft()
 
-    如何解决前几个数据包丢失的情况:
-        先打开SUB,再打开PUB
-        PUB打开后延时1s左右在发送
-        HWM设置尽量搞一些,在本文测试中,100的HWM已经可以避免前几个数据包丢失的情况
-"""
 
+    def extend(self, xs, ys, lows=None):
+        """批量添加, 先用向量化的后缀最值过滤掉必然会被后续数据弹出的元素"""
+        ys = np.asarray(ys, dtype=np.float64)
+        lows = ys if lows is None else np.asarray(lows, dtype=np.float64)
+        n = len(ys)
+        if n == 0:
+            return
+        suffixMax = np.append(np.maximum.accumulate(ys[::-1])[::-1][1:], -np.inf)
+        suffixMin = np.append(np.minimum.accumulate(lows[::-1])[::-1][1:], np.inf)
+        keep = (ys > suffixMax) | (lows < suffixMin)
+        base = self._count
+        for i in np.flatnonzero(keep):
+            self._count = base + i
+            self.push(xs[i], ys[i], lows[i])
+        self._count = base + n
+        if self._capacity is not None:
+            oldest = self._count - self._capacity
+            while self._maxQueue[0][0] < oldest:
+                self._maxQueue.popleft()
+            while self._minQueue[0][0] < oldest:
+                self._minQueue.popleft()
+
+
+    def expire(self, xMin):
+        """移除x小于xMin的数据"""
+        while self._maxQueue and self._maxQueue[0][1] < xMin:
+            self._maxQueue.popleft()
+        while self._minQueue and self._minQueue[0][1] < xMin:
+            self._minQueue.popleft()
+
+
+    def clear(self):
+        self._maxQueue.clear()
+        self._minQueue.clear()
+        self._count = 0
+
+
+
+
+class Recorder:
+    """
+        在后台线程中将各通道的数据流式追加写入磁盘
+
+        每个通道对应目录下的一个二进制文件, 按(x, y)两个float64交替存放, 可以直接用np.memmap读取;
+        meta.json记录通道名称与文件的对应关系. 数据定期flush, 进程异常退出时最多丢失flushInterval内的数据.
+        导出CSV为可选的离线转换, 见Recorder.toCsv
+    """
+
+    FLUSH_INTERVAL = 1.0    # s
+    SUFFIX = ".f64"
+    META_FILE = "meta.json"
+    _STOP = object()
+
+    def __init__(self, directory, flushInterval=FLUSH_INTERVAL):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._flushInterval = flushInterval
+        self._queue = Queue()
+        self._files = {}
+        self._channels = {}
+        self._thread = Thread(target=self._run, name="RecorderThread", daemon=True)
+        self._thread.start()
+
+
+    def append(self, channel, x, y):
+        """追加一个数据点或一组数据点, 实际写入在后台线程中完成"""
+        self._queue.put((channel, x, y))
+
+
+    def _file(self, channel):
+        f = self._files.get(channel)
+        if f is None:
+            filename = re.sub(r'[\\/:*?"<>|\s]', "_", channel) + self.SUFFIX
+            f = self._files[channel] = open(os.path.join(self.directory, filename), "ab")
+            self._channels[channel] = filename
+            with open(os.path.join(self.directory, self.META_FILE), "w") as meta:
+                json.dump({"format": "float64 x,y interleaved", "channels": self._channels}, meta, ensure_ascii=False, indent=4)
+        return f
+
+
+    def _run(self):
+        lastFlush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self._flushInterval)
+            except Empty:
+                item = None
+            if item is self._STOP:
+                break
+            if item is not None:
+                channel, x, y = item
+                data = np.column_stack((np.atleast_1d(x), np.atleast_1d(y))).astype(np.float64)
+                self._file(channel).write(data.tobytes())
+            if time.monotonic() - lastFlush >= self._flushInterval:
+                for f in self._files.values():
+                    f.flush()
+                lastFlush = time.monotonic()
+        for f in self._files.values():
+            f.close()
 
 
-@dataclass
-class RTMessage:
-    timestamp:float     # 本地接受的时间戳
-    totalTime:float     # 本次开始接受至本次消息到达的时间总长
-    message:str         # 传输的数据,该数据中也可以添加时间戳
+    def close(self):
+        """写入所有剩余的数据后关闭文件"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+        print(f"Record saved to {self.directory}")
 
 
-class Suber(QThread):
+    @classmethod
+    def files(cls, directory):
+        """返回{通道名: 数据文件的路径}"""
+        with open(os.path.join(directory, cls.META_FILE)) as meta:
+            channels = json.load(meta)["channels"]
+        return {channel: os.path.join(directory, filename) for channel, filename in channels.items()}
 
-    SPLIT_CHAR = ","
-    rtMsgSignal = pyqtSignal(RTMessage)
 
-    def __init__(self, address, topic=""):
-        super().__init__()
-        self._address = address
-        self._topic = topic
-        self._context = zmq.Context()
-        self._socket = self._context.socket(zmq.SUB)
-        self._socket.set_hwm(100)
-        self._socket.connect(self._address)
-        self._socket.setsockopt_string(zmq.SUBSCRIBE, self._topic)
-        self._stop_event = Event()
+    @classmethod
+    def load(cls, directory):
+        """以memmap的方式读取记录, 返回{通道名: shape为(n, 2)的数组}"""
+        return {channel: cls.mapChannel(path) for channel, path in cls.files(directory).items()}
 
-        self._message = None
-        self._firstRecvT = None
-        self._internal = 0
-        self._timestamp = 0
-        self._totalTime = 0
 
-        self._rtMsg = None
-        
+    @staticmethod
+    def mapChannel(path):
+        """
+            以memmap的方式读取一个通道文件, 返回shape为(n, 2)的数组
 
+            写入中断(磁盘已满, 断电或记录过程中复制)时文件末尾可能是不完整的记录, 只映射完整的(x, y)记录
+        """
+        count = os.path.getsize(path) // 16
+        if count == 0:
+            return np.zeros((0, 2))
+        return np.memmap(path, dtype=np.float64, mode="r", shape=(count, 2))
 
-    def run(self):
-        print(f"Subscriber started, listening to {self._topic} on {self._address}")
-        t1 = None
-        while not self._stop_event.is_set():
-            try:
-                message = self._socket.recv_string(flags=zmq.NOBLOCK)
-                if t1 is None:
-                    t1 = time.perf_counter()
-                    if self._firstRecvT is None:
-                        self._firstRecvT = t1
 
-                t2 = time.perf_counter()
-                self._interval = t2 - t1
-                self._timestamp = t2
-                self._totalTime = self._timestamp - self._firstRecvT
-                t1 = t2
+    @classmethod
+    def toCsv(cls, directory, outputDir=None):
+        """将记录离线转换为CSV文件, 格式与PlotSubWindow.save_data一致, 文件名与记录的数据文件相同(通道名中的"/"等字符已替换)"""
+        outputDir = directory if outputDir is None else outputDir
+        files = cls.files(directory)
+        for channel, data in cls.load(directory).items():
+            name = os.path.splitext(os.path.basename(files[channel]))[0]
+            filename = os.path.join(outputDir, f"{name}_data.csv")
+            np.savetxt(filename, data, delimiter=",", header="x,y", comments="")
+            print(f"Data saved to {filename}")
 
-                self._message = message
 
 
-                self._rtMsg = RTMessage(timestamp=self._timestamp, totalTime=self._totalTime, message=self._message)
-                self.rtMsgSignal.emit(self._rtMsg)
-                
-                print(f"Received message on topic {self._topic}: {message} | {self._totalTime} | {self._interval}")
-            except zmq.Again:
-                pass
 
-    
-    def stop(self):
-        self._stop_event.set()
-        self._socket.close()
-        self._context.term()
-        print("Subscriber stopped")
+class Channel:
+    """
+        声明式的派生通道, 对解码后的数据块(消息数, 列数)做向量化计算, 得到一列新的数据
 
+        Channel("z").deadband(0.4)                  # 死区
+        Channel("x").scale(9.8, offset=-1)          # 缩放和偏移
+        Channel.magnitude("x", "y", "z").clip(0, 10)
+        Channel("v").integrate()                    # 按x(时间)梯形积分
 
-    
-    def connect(self, slot):
-        self.rtMsgSignal.connect(slot)
+        作为addSubWindow的callback使用时, 批量模式下每批只计算一次, 不需要每条消息调用Python函数.
+        diff, integrate和filter在批之间保存状态, 因此一个Channel只能用于一个子窗口;
+        需要在多个子窗口中使用(如原始数据和滤波后的数据叠加显示)时, 使用RealTimePlot.addChannel只计算一次
+    """
+
+    def __init__(self, column):
+        self._sources = [column]
+        self._columns = None
+        self._magnitude = False
+        self._stages = []
+
+
+    @classmethod
+    def magnitude(cls, *columns):
+        """多个列的模长"""
+        channel = cls(columns[0])
+        channel._sources = list(columns)
+        channel._magnitude = True
+        return channel
+
+
+    def bind(self, columnIndex: Callable):
+        """通过columnIndex将列名转换为列序号, 由RealTimePlot在创建子窗口时调用"""
+        self._columns = np.array([columnIndex(column) for column in self._sources], dtype=np.intp)
+        return self
+
+
+    def scale(self, gain=1.0, offset=0.0):
+        self._stages.append(lambda xs, ys: ys * gain + offset)
+        return self
+
+
+    def abs(self):
+        self._stages.append(lambda xs, ys: np.abs(ys))
+        return self
+
+
+    def deadband(self, threshold):
+        """绝对值不超过threshold的数据置为0"""
+        self._stages.append(lambda xs, ys: np.where(np.abs(ys) <= threshold, 0.0, ys))
+        return self
 
 
+    def clip(self, low=None, high=None):
+        self._stages.append(lambda xs, ys: np.clip(ys, low, high))
+        return self
+
+
+    def diff(self, perSecond=False):
+        """相邻数据的差分, perSecond为True时除以时间间隔(导数), 第一个数据为0"""
+        self._stages.append(_DiffStage(perSecond))
+        return self
+
+
+    def integrate(self):
+        """按x梯形积分"""
+        self._stages.append(_IntegrateStage())
+        return self
+
+
+    def filter(self, streamFilter):
+        """流式滤波, 如IIRFilter, FIRFilter, MovingAverage, MedianFilter, 滤波器的状态在批之间保存"""
+        self._stages.append(streamFilter)
+        return self
+
+
+    def reset(self):
+        """清除diff, integrate和滤波器的状态"""
+        for stage in self._stages:
+            if hasattr(stage, "reset"):
+                stage.reset()
+
+
+    def apply(self, xs, values):
+        """
+            计算一批数据
+
+        Args:
+            xs (np.ndarray): 每条消息的x, shape为(消息数,)
+            values (np.ndarray): 解码后的数据, shape为(消息数, 列数)
+
+        Returns:
+            np.ndarray: shape为(消息数,)的派生数据
+        """
+        columns = self._columns if self._columns is not None else np.asarray(self._sources, dtype=np.intp)
+        if self._magnitude:
+            ys = np.sqrt(np.einsum("ij,ij->i", values[:, columns], values[:, columns]))
+        else:
+            ys = values[:, columns[0]].astype(np.float64)
+        for stage in self._stages:
+            ys = stage(xs, ys)
+        return ys
+
+
+
+class _DiffStage:
+
+    def __init__(self, perSecond):
+        self._perSecond = perSecond
+        self.reset()
+
+
+    def reset(self):
+        self._lastX = None
+        self._lastY = None
+
+
+    def __call__(self, xs, ys):
+        if self._lastY is None:
+            prevX, prevY = xs[0], ys[0]
+        else:
+            prevX, prevY = self._lastX, self._lastY
+        out = np.diff(ys, prepend=prevY)
+        if self._perSecond:
+            dt = np.diff(xs, prepend=prevX)
+            out = np.divide(out, dt, out=np.zeros_like(out), where=dt > 0)
+        self._lastX, self._lastY = xs[-1], ys[-1]
+        return out
+
+
+
+class _IntegrateStage:
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        self._lastX = None
+        self._lastY = None
+        self._total = 0.0
+
+
+    def __call__(self, xs, ys):
+        if self._lastY is None:
+            self._lastX, self._lastY = xs[0], ys[0]
+        areas = (ys + np.concatenate(([self._lastY], ys[:-1]))) * np.diff(xs, prepend=self._lastX) / 2
+        out = self._total + np.cumsum(areas)
+        self._lastX, self._lastY, self._total = xs[-1], ys[-1], out[-1]
+        return out
+
+
+
+class IIRFilter:
+    """
+        流式IIR滤波器(直接II型转置), 在批之间保存状态, 初始状态为第一个数据的稳态, 避免启动时的瞬态
+
+        依赖scipy.signal.lfilter做向量化计算. 没有安装scipy时退化为Python逐点循环, 结果相同但比scipy慢得多,
+        只适合低采样率或离线使用, 第一次创建时给出警告. 常用的二阶滤波器可以通过IIRFilter.biquad设计
+    """
+
+    _warned = False     # 缺少scipy的警告只输出一次
+
+    def __init__(self, b, a):
+        if scipySignal is None and not IIRFilter._warned:
+            IIRFilter._warned = True
+            warnings.warn("scipy is not installed, IIRFilter falls back to a slow per-sample Python loop, install scipy for real-time use", stacklevel=2)
+        a = np.asarray(a, dtype=np.float64)
+        self._b = np.asarray(b, dtype=np.float64) / a[0]
+        self._a = a / a[0]
+        n = max(len(self._a), len(self._b))
+        self._b = np.pad(self._b, (0, n - len(self._b)))
+        self._a = np.pad(self._a, (0, n - len(self._a)))
+        self._ziStep = self._steadyState()
+        self.reset()
+
+
+    @classmethod
+    def biquad(cls, kind, cutoff, sampleRate, q=1 / math.sqrt(2)):
+        """
+            二阶滤波器(RBJ Audio EQ Cookbook)
+
+        Args:
+            kind (str): "lowpass", "highpass", "bandpass"或"notch"
+            cutoff (float): 截止频率或中心频率(Hz)
+            sampleRate (float): 采样频率(Hz)
+            q (float, optional): 品质因数. Defaults to 1/sqrt(2).
+        """
+        w0 = 2 * math.pi * cutoff / sampleRate
+        cos, alpha = math.cos(w0), math.sin(w0) / (2 * q)
+        if kind == "lowpass":
+            b = [(1 - cos) / 2, 1 - cos, (1 - cos) / 2]
+        elif kind == "highpass":
+            b = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2]
+        elif kind == "bandpass":
+            b = [alpha, 0, -alpha]
+        elif kind == "notch":
+            b = [1, -2 * cos, 1]
+        else:
+            raise ValueError(f"Unknown biquad kind {kind}")
+        return cls(b, [1 + alpha, -2 * cos, 1 - alpha])
+
+
+    def _steadyState(self):
+        """输入恒为1时的稳态状态(与scipy.signal.lfilter_zi相同)"""
+        n = len(self._a)
+        if n < 2:
+            return np.zeros(0)
+        companion = np.zeros((n - 1, n - 1))
+        companion[0] = -self._a[1:]
+        companion[1:, :-1] += np.eye(n - 2)
+        return np.linalg.solve(np.eye(n - 1) - companion.T, self._b[1:] - self._a[1:] * self._b[0])
+
+
+    def reset(self):
+        self._zi = None
+
+
+    def __call__(self, xs, ys):
+        ys = np.asarray(ys, dtype=np.float64)
+        if self._zi is None:
+            self._zi = self._ziStep * ys[0]
+        if scipySignal is not None:
+            out, self._zi = scipySignal.lfilter(self._b, self._a, ys, zi=self._zi)
+            return out
+        # 慢速路径: 没有scipy时逐点计算
+        b, a = self._b.tolist(), self._a.tolist()
+        z = self._zi.tolist() + [0.0]
+        order = len(z) - 1
+        out = np.empty_like(ys)
+        for i, x in enumerate(ys.tolist()):
+            y = b[0] * x + z[0]
+            for k in range(order):
+                z[k] = b[k + 1] * x + z[k + 1] - a[k + 1] * y
+            out[i] = y
+        self._zi = np.array(z[:order])
+        return out
+
+
+
+class FIRFilter:
+    """流式FIR滤波器, 保存最近len(taps) - 1个数据, 每批一次np.convolve"""
+
+    def __init__(self, taps):
+        self._taps = np.asarray(taps, dtype=np.float64)
+        self.reset()
+
+
+    def reset(self):
+        self._history = None
+
+
+    def __call__(self, xs, ys):
+        ys = np.asarray(ys, dtype=np.float64)
+        if self._history is None:
+            self._history = np.full(len(self._taps) - 1, ys[0])
+        data = np.concatenate((self._history, ys))
+        self._history = data[len(data) - len(self._taps) + 1:]
+        return np.convolve(data, self._taps, mode="valid")
+
+
+
+class MovingAverage(FIRFilter):
+    """size个数据的滑动平均"""
+
+    def __init__(self, size):
+        super().__init__(np.full(int(size), 1 / int(size)))
+
+
+
+class MedianFilter:
+    """size个数据的滑动中值, 用于去除尖峰"""
+
+    def __init__(self, size):
+        self._size = int(size)
+        self.reset()
+
+
+    def reset(self):
+        self._history = None
+
+
+    def __call__(self, xs, ys):
+        ys = np.asarray(ys, dtype=np.float64)
+        if self._history is None:
+            self._history = np.full(self._size - 1, ys[0])
+        data = np.concatenate((self._history, ys))
+        self._history = data[len(data) - self._size + 1:]
+        return np.median(np.lib.stride_tricks.sliding_window_view(data, self._size), axis=-1)
+
+
+
+@dataclass
+class RenderProfile:
+    """
+        子窗口曲线的绘制参数
+
+        Qt绘制宽度大于1的画笔非常慢, 高频数据使用RenderProfile.performance(): 1像素的cosmetic画笔,
+        pyqtgraph按视图宽度自动peak降采样, 只绘制视图内的数据, 跳过NaN/Inf检查
+    """
+    penWidth:float = 3
+    penColor:str = "w"
+    antialias:bool = False
+    downsample:bool = False         # 按视图宽度自动降采样(peak模式, 保留峰值)
+    clipToView:bool = False         # 只绘制x在视图范围内的数据
+    skipFiniteCheck:bool = False    # 数据中不含NaN/Inf时可以跳过检查
+    useOpenGL:bool = False          # 使用OpenGL绘制, 作用于整个RealTimePlot
+
+    @classmethod
+    def quality(cls):
+        return cls()
+
+
+    @classmethod
+    def performance(cls, useOpenGL=False):
+        return cls(penWidth=1, downsample=True, clipToView=True, skipFiniteCheck=True, useOpenGL=useOpenGL)
+
 
 
 class PlotSubWindow(ABC):
     
     DEFAULT_X_RANGE = (0, 10)
     DEFAULT_Y_RANGE = (-1, 1)
+    X_AXIS = "time"     # x轴的含义, 十字线只在x轴含义相同的子窗口之间同步
 
     def __init__(self, title, callback, row, col, xRange, yRange, win):
+        self.title = title
+        self.recorder = None    # 设置Recorder后, 写入缓冲区的数据同时追加写入磁盘
+        self.stats = None       # 设置PipelineStats后, 统计callback和append的耗时
+        self.topic = None       # 子窗口绑定的topic, 由RealTimePlot.addSubWindow设置
         self.plot = win.addPlot(row, col, title=title)
         self.plot.setTitle(title, size="30pt")
 
-        self.x_data = []
-        self.y_data = []
+        self._initBuffers()
+        self._extrema = self._createExtrema()
+        self._dirty = False
+        self._lastX = None
 
         self.curve = self.plot.plot()
-        self.curve.setPen(pg.mkPen(color="w", width=3))
+        self.setRenderProfile(RenderProfile())
 
         # 设置坐标轴标签的字体大小
         axis_font = QtGui.QFont()
@@ -168,17 +2158,16 @@ class PlotSubWindow(ABC):
         # self.plot.addItem(self.lastValue)
 
         # 添加鼠标数据
-        # self._mouseValue = pg.TextItem(anchor=(0, 1), color=(100,100,100))
-        # self._mouseValue.setFont(axis_font)
-        # self.plot.addItem(self._mouseValue)
+        self._mouseValue = pg.TextItem(anchor=(0, 1), color=(100,100,100))
+        self._mouseValue.setFont(axis_font)
+        self.plot.addItem(self._mouseValue, ignoreBounds=True)
 
-        # 鼠标横纵轴
-        # self._vLine = pg.InfiniteLine(angle=90, movable=False)
-        # self._hLine = pg.InfiniteLine(angle=0, movable=False)
-        # self.plot.addItem(self._vLine, ignoreBounds=True)
-        # self.plot.addItem(self._hLine, ignoreBounds=True)
-
-        # self.proxy = pg.SignalProxy(self.plot.scene().sigMouseMoved, rateLimit=60, slot=self.mouseMoved)
+        # 鼠标横纵轴, 由RealTimePlot.enableCrosshair统一更新
+        self._vLine = pg.InfiniteLine(angle=90, movable=False)
+        self._hLine = pg.InfiniteLine(angle=0, movable=False)
+        self.plot.addItem(self._vLine, ignoreBounds=True)
+        self.plot.addItem(self._hLine, ignoreBounds=True)
+        self.hideCrosshair()
 
 
         # 设置y轴的初始范围
@@ -194,14 +2183,198 @@ class PlotSubWindow(ABC):
             self.plot.setXRange(*self.DEFAULT_X_RANGE, padding=0.1)
 
 
+        # callback可以是函数, 也可以是Suber解码后数据的列序号或派生通道Channel, 绑定列时不需要每条消息调用Python函数
         self.callback = callback
+        self._channel = callback if isinstance(callback, Channel) else None
+        if callable(callback) or self._channel is not None:
+            self._column = None
+        elif isinstance(callback, (list, tuple, np.ndarray)):
+            self._column = np.asarray(callback, dtype=np.intp)
+        else:
+            self._column = int(callback)
+
+
+    def _initBuffers(self):
+        self.x_data = []
+        self.y_data = []
+
+
+    def _createExtrema(self):
+        return RunningExtrema()
+
+
+    def setRenderProfile(self, profile: RenderProfile):
+        """设置曲线的绘制参数, useOpenGL由RealTimePlot设置"""
+        self.profile = profile
+        self._applyProfile(self.curve, profile.penColor)
+
+
+    def _applyProfile(self, curve, color):
+        profile = self.profile
+        # cosmetic画笔的宽度按像素计算, 不随坐标缩放
+        pen = pg.mkPen(color=color, width=profile.penWidth)
+        pen.setCosmetic(True)
+        curve.setPen(pen)
+        curve.opts["antialias"] = profile.antialias
+        curve.setDownsampling(auto=profile.downsample, method="peak")
+        curve.setClipToView(profile.clipToView)
+        curve.setSkipFiniteCheck(profile.skipFiniteCheck)
+
+
+    def _showExtrema(self, x):
+        """根据极值跟踪器更新最大值和最小值的显示以及y轴的范围"""
+        max_y = self._extrema.max
+        min_y = self._extrema.min
+        if max_y is None:
+            return
+        self.max_text.setText(f'Max: {max_y:.2f}')
+        self.min_text.setText(f'Min: {min_y:.2f}')
+        self.max_text.setPos(x, max_y)
+        self.min_text.setPos(x, min_y)
+
+        # 更新y轴的范围
+        if self._yRange is None:
+            self.plot.setYRange(min_y, max_y, padding=0.1)
+
 
-    
-    @abstractmethod
     def update(self, rtMsg):
+        """接收数据并立即重绘(同步模式)"""
+        self.append(rtMsg)
+        self.render()
+
+
+    def append(self, rtMsg):
+        """只将数据写入缓冲区并标记需要重绘, 重绘由RealTimePlot的定时器统一调度"""
+        t0 = time.perf_counter()
+        if self._column is not None:
+            if rtMsg.values is None:
+                return
+            x, y = rtMsg.totalTime, rtMsg.values[self._column]
+        elif self._channel is not None:
+            if rtMsg.values is None:
+                return
+            x = rtMsg.totalTime
+            y = self._channel.apply(np.array([x]), rtMsg.values[np.newaxis])[0]
+        else:
+            x, y = self.callback(rtMsg)
+        if x is None or y is None:
+            return
+        t1 = time.perf_counter()
+        self._append(x, y)
+        if self.stats is not None:
+            self.stats.record("callback", t1 - t0)
+            self.stats.record("append", time.perf_counter() - t1)
+        self._lastX = x
+        self._dirty = True
+        if self.recorder is not None:
+            self._record(x, y)
+
+
+    def appendBatch(self, batch: RTBatch):
+        """批量写入一个RTBatch"""
+        t0 = time.perf_counter()
+        if self._column is not None:
+            if batch.values is None or len(batch) == 0:
+                return
+            xs, ys = batch.totalTimes, batch.values[:, self._column]
+        elif self._channel is not None:
+            if batch.values is None or len(batch) == 0:
+                return
+            xs = batch.totalTimes
+            ys = self._channel.apply(xs, batch.values)
+        else:
+            points = [self.callback(rtMsg) for rtMsg in batch]
+            points = [(x, y) for x, y in points if x is not None and y is not None]
+            if not points:
+                return
+            xs = np.array([x for x, _ in points], dtype=np.float64)
+            ys = np.array([y for _, y in points], dtype=np.float64)
+        t1 = time.perf_counter()
+        self._extend(xs, ys)
+        if self.stats is not None:
+            self.stats.record("callback", t1 - t0)
+            self.stats.record("append", time.perf_counter() - t1)
+        self._lastX = xs[-1]
+        self._dirty = True
+        if self.recorder is not None:
+            self._record(xs, ys)
+
+
+    def _record(self, x, y):
+        self.recorder.append(self.title, x, y)
+
+
+    def _extend(self, xs, ys):
+        for x, y in zip(xs, ys):
+            self._append(x, y)
+
+
+    def render(self):
+        """数据有变化时重绘, 返回是否进行了重绘"""
+        if not self._dirty:
+            return False
+        self._dirty = False
+        self._render()
+        return True
+
+
+    @abstractmethod
+    def _append(self, x, y):
+        pass
+
+
+    @abstractmethod
+    def _render(self):
         pass
 
 
+    @staticmethod
+    def _nearest(xs, x):
+        """二分查找有序数组xs中与x最近的位置, O(log n)"""
+        i = int(np.searchsorted(xs, x))
+        if i == len(xs) or (i > 0 and x - xs[i - 1] < xs[i] - x):
+            i -= 1
+        return i
+
+
+    def sampleAt(self, x):
+        """返回与x最近的数据(x, y), 没有数据时返回None"""
+        x_data = self.x_data
+        if len(x_data) == 0:
+            return None
+        i = self._nearest(x_data, x)
+        return x_data[i], self.y_data[i]
+
+
+    def showCrosshair(self, x):
+        """在与x最近的数据处显示十字线和数值"""
+        sample = self.sampleAt(x)
+        if sample is None:
+            self.hideCrosshair()
+            return
+        x, values = sample[0], np.atleast_1d(sample[1])
+        y = values[0]
+        # 对数坐标下图元的位置为log10
+        if self.plot.getAxis("left").logMode and y > 0:
+            y = np.log10(y)
+        self._vLine.setPos(x)
+        self._vLine.show()
+        if np.isfinite(y):
+            self._hLine.setPos(y)
+            self._hLine.show()
+            self._mouseValue.setPos(x, y)
+        else:
+            self._hLine.hide()
+        self._mouseValue.setText(f"{x:.3f}: " + ", ".join(f"{value:.3f}" for value in values))
+        self._mouseValue.show()
+
+
+    def hideCrosshair(self):
+        self._vLine.hide()
+        self._hLine.hide()
+        self._mouseValue.hide()
+
+
     def save_data(self, filename):
         """保存当前窗口的数据为CSV文件"""
         data = np.column_stack((self.x_data, self.y_data))
@@ -211,117 +2384,574 @@ class PlotSubWindow(ABC):
 
 class CompressWindow(PlotSubWindow):
 
+    MAX_DISPLAY_POINTS = 4000       # 数据量超过该值后, 按视图宽度进行min/max抽取后再显示
 
-    def update(self, rtMsg):
 
-        x, y = self.callback(rtMsg)
+    def _initBuffers(self):
+        # 压缩窗口显示全部历史数据, 使用按需倍增的缓冲区, 并增量维护抽取结果
+        self._xBuffer = GrowableBuffer()
+        self._yBuffer = GrowableBuffer()
+        self._decimator = MinMaxDecimator(self.MAX_DISPLAY_POINTS // 4)
 
-        if x is None or y is None:
-            return
+
+    @property
+    def x_data(self):
+        return self._xBuffer.view()
+
+
+    @property
+    def y_data(self):
+        return self._yBuffer.view()
+
+
+    def _checkResolution(self):
+        """视图宽度变化时, 按新的像素列数重建抽取结果"""
+        width = int(self.plot.getViewBox().width())
+        maxBuckets = min(max(width // 2, 1), self.MAX_DISPLAY_POINTS // 4)
+        if width > 0 and maxBuckets != self._decimator.maxBuckets:
+            self._decimator = MinMaxDecimator(maxBuckets)
+            self._decimator.extend(self.x_data, self.y_data)
+
+
+    def _append(self, x, y):
         # 存储新数据点
-        self.x_data.append(x)
-        self.y_data.append(y)
-        
+        self._xBuffer.append(x)
+        self._yBuffer.append(y)
+        self._decimator.push(x, y)
+        self._extrema.push(x, y)
+
+
+    def _extend(self, xs, ys):
+        self._xBuffer.extend(xs)
+        self._yBuffer.extend(ys)
+        self._decimator.extend(xs, ys)
+        self._extrema.extend(xs, ys)
+
+
+    def _render(self):
+        x = self._lastX
         # 更新曲线的数据
-        self.curve.setData(self.x_data, self.y_data)
+        if len(self._xBuffer) <= self.MAX_DISPLAY_POINTS:
+            self.curve.setData(self.x_data, self.y_data)
+        else:
+            self._checkResolution()
+            self.curve.setData(*self._decimator.points())
 
         # 更新最大值和最小值的显示
-        if self.y_data:
-            max_y = max(self.y_data)
-            min_y = min(self.y_data)
-            self.max_text.setText(f'Max: {max_y:.2f}')
-            self.min_text.setText(f'Min: {min_y:.2f}')
-            self.max_text.setPos(self.x_data[-1], max_y)
-            self.min_text.setPos(self.x_data[-1], min_y)
-
-            # 更新y轴的范围
-            if self._yRange is None:
-                self.plot.setYRange(min_y, max_y, padding=0.1)
-
-            if x >= self.DEFAULT_X_RANGE[1]:
-                self.plot.enableAutoRange(axis="x")
+        self._showExtrema(x)
+
+        if x >= self.DEFAULT_X_RANGE[1]:
+            self.plot.enableAutoRange(axis="x")
 
 
 
 
 class FixedWindow(PlotSubWindow):
-    
-    def update(self):
-        pass
+    """
+        扫描(示波器)显示: x轴固定为[0, sweepSize), 新数据从左向右在光标处原地覆盖旧数据, 到达右端后回到左端
+
+        x轴按采样频率划分为固定数量的格子, 数据按时间写入对应的格子, 相邻数据之间跳过的格子线性插值;
+        光标前方BLANK_RATIO比例的格子置为NaN, 用于区分新旧数据. 缓冲区预分配, 写入不移动数据也不重新分配内存,
+        x轴和x范围始终不变, 每次重绘只将同一个数组传给曲线
+    """
+
+    DEFAULT_SAMPLE_RATE = 1000      # 预期的采样频率(Hz), 每个格子对应一个采样周期
+    BLANK_RATIO = 0.02      # 光标前方空白区域占扫描宽度的比例
+    X_AXIS = "phase"
+
+    def __init__(self, title, callback, row, col, xRange, yRange, win, sweepSize = 10, sampleRate = DEFAULT_SAMPLE_RATE):
+        self._sweepSize = sweepSize
+        self._bins = max(int(sweepSize * sampleRate), 2)
+        self._binsPerSecond = self._bins / sweepSize
+        self._blank = max(int(self._bins * self.BLANK_RATIO), 1)
+        super().__init__(title, callback, row, col, xRange, yRange, win)
+        self.plot.disableAutoRange(axis="x")
+        self.plot.setXRange(0, sweepSize, padding=0)
+        self._cursor = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen(color=(100, 100, 100)))
+        self.plot.addItem(self._cursor, ignoreBounds=True)
+
+
+    def _initBuffers(self):
+        self._xBuffer = np.arange(self._bins) / self._binsPerSecond
+        self._yBuffer = np.full(self._bins, np.nan)
+        self._lastBin = None    # 最近写入的格子的绝对序号(不取模)
+        self._lastPos = None    # 最近一个数据的绝对位置(以格子为单位)
+        self._lastY = None
+
+
+    def _createExtrema(self):
+        return WindowExtrema(self._bins + 1)
+
+
+    def setRenderProfile(self, profile: RenderProfile):
+        super().setRenderProfile(profile)
+        # 空白区域为NaN, 不能跳过检查
+        self.curve.setSkipFiniteCheck(False)
+
+
+    @property
+    def x_data(self):
+        return self._xBuffer
+
+
+    @property
+    def y_data(self):
+        return self._yBuffer
+
+
+    def _append(self, x, y):
+        pos = x * self._binsPerSecond
+        current = int(pos)
+        if self._lastBin is None:
+            self._yBuffer[current % self._bins] = y
+        elif current > self._lastBin:
+            # 通常只前进一个格子, 超过一个扫描宽度时只写入最后一圈
+            first = max(self._lastBin + 1, current - self._bins + 1)
+            slope = (y - self._lastY) / (pos - self._lastPos)
+            for k in range(first, current + 1):
+                self._yBuffer[k % self._bins] = self._lastY + slope * (k - self._lastPos)
+        elif current < self._lastBin:
+            # 时间回退(数据源重启), 从新的位置开始扫描
+            self._yBuffer[current % self._bins] = y
+        self._blankAhead(current)
+        self._lastBin, self._lastPos, self._lastY = current, pos, y
+        self._extrema.push(x, y)
+
+
+    def _extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        pos = xs * self._binsPerSecond
+        if self._lastPos is not None and pos[0] < self._lastPos:
+            # 时间回退(数据源重启), 从新的位置开始扫描
+            self._lastBin = self._lastPos = None
+        current = int(pos[-1])
+        first = int(pos[0]) if self._lastBin is None else self._lastBin + 1
+        first = max(first, current - self._bins + 1)
+        if current >= first:
+            # 将数据重采样到格子上, 从上一个数据开始插值, 与已写入的部分连续
+            knots, values = pos, ys
+            if self._lastPos is not None:
+                knots = np.concatenate(([self._lastPos], pos))
+                values = np.concatenate(([self._lastY], ys))
+            bins = np.arange(first, current + 1)
+            self._yBuffer[bins % self._bins] = np.interp(bins, knots, values)
+            self._blankAhead(current)
+            self._lastBin = current
+        self._lastPos, self._lastY = pos[-1], ys[-1]
+        self._extrema.extend(xs, ys)
+
+
+    def _blankAhead(self, current):
+        start = (current + 1) % self._bins
+        end = start + self._blank
+        self._yBuffer[start:end] = np.nan
+        if end > self._bins:
+            self._yBuffer[:end - self._bins] = np.nan
+
+
+    def _render(self):
+        x = self._lastX
+        self._extrema.expire(x - self._sweepSize)
+        self.curve.setData(self._xBuffer, self._yBuffer, connect="finite")
+        self._cursor.setPos(x % self._sweepSize)
+        self._showExtrema(self._sweepSize)
 
 
 
 class RollWindow(PlotSubWindow):
     
-    DEFAULT_ROLL_DATA_NUM = 1000
+    DEFAULT_SAMPLE_RATE = 1000      # 预期的采样频率(Hz), 用于确定环形缓冲区的容量
+    CAPACITY_MARGIN = 1.2           # 采样频率存在波动, 容量上预留一定的余量
 
-    def __init__(self, title, callback, row, col, xRange, yRange, win, rollWindowSize = 10):
-        self._moveWindowIndex = None
+    def __init__(self, title, callback, row, col, xRange, yRange, win, rollWindowSize = 10, sampleRate = DEFAULT_SAMPLE_RATE):
+        self._rolling = False
         self._rollWindowSize = rollWindowSize
+        self._sampleRate = sampleRate
         super().__init__(title, callback, row, col, xRange, yRange, win)
 
 
-    def update(self, rtMsg):
+    def _initBuffers(self):
+        # 固定容量的环形缓冲区, 内存占用不随运行时间增长
+        capacity = int(self._rollWindowSize * self._sampleRate * self.CAPACITY_MARGIN) + 1
+        self._xBuffer = RingBuffer(capacity)
+        self._yBuffer = RingBuffer(capacity)
 
-        x, y = self.callback(rtMsg)
 
+    def _createExtrema(self):
+        return WindowExtrema(self._xBuffer.capacity)
+
+
+    @property
+    def x_data(self):
+        return self._xBuffer.view()
+
+
+    @property
+    def y_data(self):
+        return self._yBuffer.view()
+
+
+    def _append(self, x, y):
         # 存储新数据点
-        self.x_data.append(x)
-        self.y_data.append(y)
+        self._xBuffer.append(x)
+        self._yBuffer.append(y)
+        self._extrema.push(x, y)
+
+
+    def _extend(self, xs, ys):
+        self._xBuffer.extend(xs)
+        self._yBuffer.extend(ys)
+        self._extrema.extend(xs, ys)
+
+
+    def _window(self):
+        """返回滚动窗口内的数据视图"""
+        x = self._lastX
+        x_data = self._xBuffer.view()
+        y_data = self._yBuffer.view()
         if x >= self._rollWindowSize:
-            if self._moveWindowIndex is None:
-                index = self._moveWindowIndex = 0
-                # self.plot.autoRange(item=self.plot.getAxis('bottom'))
+            if not self._rolling:
+                self._rolling = True
                 self.plot.enableAutoRange(axis="x")
-            else:
-                index = self._moveWindowIndex = self._moveWindowIndex + 1
-            # print(len(self.x_data), index)
-            
-            if index >= self.DEFAULT_ROLL_DATA_NUM:
-                self.x_data = self.x_data[index:]
-                self.y_data = self.y_data[index:]
-                index = self._moveWindowIndex = 0 
+            # 时间戳单调递增, 二分查找滚动窗口的起始位置
+            index = np.searchsorted(x_data, x - self._rollWindowSize)
+            self._extrema.expire(x - self._rollWindowSize)
+            x_data = x_data[index:]
+            y_data = y_data[index:]
+        return x_data, y_data
 
-            x_data = self.x_data[index:]
-            y_data = self.y_data[index:]
-        else:
-            x_data = self.x_data
-            y_data = self.y_data
+
+    def _render(self):
+        x = self._lastX
+        x_data, y_data = self._window()
         
         # 更新曲线的数据
         self.curve.setData(x_data, y_data)
-        # if self._moveWindowIndex is not None:
-        #     # self.curve.setPos(self.x_data[self._moveWindowIndex], 0)
-        #     print(self._moveWindowIndex, x_data[0])
 
         # 更新最大值和最小值的显示
-        if self.y_data:
-            max_y = max(self.y_data)
-            min_y = min(self.y_data)
-            self.max_text.setText(f'Max: {max_y:.2f}')
-            self.min_text.setText(f'Min: {min_y:.2f}')
-            self.max_text.setPos(self.x_data[-1], max_y)
-            self.min_text.setPos(self.x_data[-1], min_y)
-
-            # 更新y轴的范围
-            if self._yRange is None:
-                self.plot.setYRange(min_y, max_y, padding=0.1)
+        self._showExtrema(x)
             
-            # self.lastValue.setText(f"{round(x,5)},{round(y, 5)}")
-            # self.lastValue.setPos(self.x_data[self._moveWindowIndex], max_y)
+        # self.lastValue.setText(f"{round(x,5)},{round(y, 5)}")
+        # self.lastValue.setPos(x, self._extrema.max)
+
+
+
+
+class MultiCurveWindow(RollWindow):
+    """
+        多条曲线共用一个x环形缓冲区的滚动窗口, 适用于多轴传感器(如力的X/Y/Z分量)
+
+        y使用(容量, 通道数)的二维环形缓冲区, 每条消息只调用一次callback(返回(x, 向量))或按多个列序号取值,
+        时间戳只存储一份; 最大值和最小值为所有通道中的极值
+    """
+
+    def __init__(self, title, callback, row, col, xRange, yRange, win, rollWindowSize = 10, sampleRate = RollWindow.DEFAULT_SAMPLE_RATE, names = None):
+        """names为各通道的名称, 设置后显示图例"""
+        self._names = names
+        super().__init__(title, callback, row, col, xRange, yRange, win, rollWindowSize, sampleRate)
+        if names is not None:
+            self.plot.addLegend()
+        
+
+    def _initBuffers(self):
+        super()._initBuffers()
+        # 通道数在收到第一个数据时确定
+        self._yBuffer = None
+        self.curves = []
+
+
+    @property
+    def y_data(self):
+        return self._yBuffer.view() if self._yBuffer is not None else np.zeros((0, 0))
+
+
+    def _createCurves(self, width):
+        self._yBuffer = RingBuffer(self._xBuffer.capacity, width)
+        for i in range(width):
+            name = self._names[i] if self._names is not None and i < len(self._names) else None
+            curve = self.curve if i == 0 else self.plot.plot()
+            if name is not None:
+                self.plot.legend.addItem(curve, name)
+            self.curves.append(curve)
+        self.setRenderProfile(self.profile)
+
+
+    def setRenderProfile(self, profile: RenderProfile):
+        self.profile = profile
+        curves = self.curves or [self.curve]
+        for i, curve in enumerate(curves):
+            color = profile.penColor if len(curves) == 1 else pg.intColor(i, hues=len(curves))
+            self._applyProfile(curve, color)
+
+
+    def _append(self, x, y):
+        y = np.asarray(y, dtype=np.float64)
+        if self._yBuffer is None:
+            self._createCurves(y.size)
+        self._xBuffer.append(x)
+        self._yBuffer.append(y)
+        self._extrema.push(x, y.max(), y.min())
+
+
+    def _extend(self, xs, ys):
+        ys = np.asarray(ys, dtype=np.float64).reshape(len(xs), -1)
+        if self._yBuffer is None:
+            self._createCurves(ys.shape[1])
+        self._xBuffer.extend(xs)
+        self._yBuffer.extend(ys)
+        self._extrema.extend(xs, ys.max(axis=1), ys.min(axis=1))
 
 
+    def _record(self, x, y):
+        y = np.asarray(y)
+        for i in range(y.shape[-1]):
+            name = self._names[i] if self._names is not None and i < len(self._names) else str(i)
+            self.recorder.append(f"{self.title}/{name}", x, y[..., i])
 
-    # def mouseMoved(self, e):
-    #     pos = e[0]
 
-    #     if self.plot.sceneBoundingRect().contains(pos):
-    #         mousePoint = self.plot.vb.mapSceneToView(pos)
-    #         index = int(mousePoint.x())
-    #         if index > 0  and index < len(self.x_data):
-    #             self._vLine.setPos(mousePoint.x())
-    #             self._hLine.setPos(mousePoint.y())
-    #             self._mouseValue.setText("1234")
+    def _render(self):
+        x = self._lastX
+        x_data, y_data = self._window()
+        for i, curve in enumerate(self.curves):
+            curve.setData(x_data, y_data[:, i])
+        self._showExtrema(x)
+
+
+    def save_data(self, filename):
+        """保存当前窗口的数据为CSV文件, 每个通道一列"""
+        y_data = self.y_data
+        names = [self._names[i] if self._names is not None and i < len(self._names) else str(i) for i in range(y_data.shape[1])]
+        np.savetxt(filename, np.column_stack((self.x_data, y_data)), delimiter=",", header=",".join(["x"] + names), comments="")
+        print(f"Data saved to {filename}")
+
+
+
+class SpectrumWindow(MultiCurveWindow):
+    """
+        频谱窗口: 对最近的数据做加窗的实数FFT, 显示幅值谱, y轴为对数坐标
+
+        数据只写入环形缓冲区, 频谱在重绘时计算. 使用Welch方法, 将最近(averages + 1) * fftSize / 2个数据
+        分为averages段50%重叠的数据, 各段的功率谱取平均以降低噪声; 所有段和所有通道在一次rfft中向量化计算.
+        采样频率由缓冲区内数据的时间跨度估计
+    """
+
+    DEFAULT_FFT_SIZE = 1024
+    DEFAULT_AVERAGES = 4
+    X_AXIS = "frequency"
+
+    def __init__(self, title, callback, row, col, xRange, yRange, win, fftSize = DEFAULT_FFT_SIZE, averages = DEFAULT_AVERAGES, names = None):
+        """
+
+        Args:
+            fftSize (int, optional): 每段数据的长度, 频率分辨率为采样频率 / fftSize. Defaults to DEFAULT_FFT_SIZE.
+            averages (int, optional): Welch平均的段数, 1表示不平均. Defaults to DEFAULT_AVERAGES.
+            names (list, optional): 各通道的名称, 设置后显示图例. Defaults to None.
+        """
+        self._fftSize = int(fftSize)
+        self._hop = self._fftSize // 2
+        self._averages = max(int(averages), 1)
+        self._taper = np.hanning(self._fftSize)
+        # 幅值校正, 正弦信号的峰值等于其幅值
+        self._scale = 2 / self._taper.sum()
+        super().__init__(title, callback, row, col, xRange, yRange, win, names=names)
+        self.plot.setLogMode(x=False, y=True)
+        self.plot.setLabel("bottom", "Hz")
+        if xRange is None:
+            self.plot.enableAutoRange(axis="x")
+        if yRange is None:
+            self.plot.enableAutoRange(axis="y")
+        self.min_text.hide()
+        self._freqs = None
+        self._spectrum = None
+
+
+    def _initBuffers(self):
+        capacity = self._fftSize + self._hop * (self._averages - 1)
+        self._xBuffer = RingBuffer(capacity)
+        self._yBuffer = None
+        self.curves = []
+
+
+    def _append(self, x, y):
+        # 频谱窗口不显示时域的极值, 只写入缓冲区
+        y = np.asarray(y, dtype=np.float64)
+        if self._yBuffer is None:
+            self._createCurves(y.size)
+        self._xBuffer.append(x)
+        self._yBuffer.append(y)
+
+
+    def _extend(self, xs, ys):
+        ys = np.asarray(ys, dtype=np.float64).reshape(len(xs), -1)
+        if self._yBuffer is None:
+            self._createCurves(ys.shape[1])
+        self._xBuffer.extend(xs)
+        self._yBuffer.extend(ys)
+
+
+    def _render(self):
+        x_data = self._xBuffer.view()
+        if len(x_data) < self._fftSize or x_data[-1] <= x_data[0]:
+            return
+        sampleRate = (len(x_data) - 1) / (x_data[-1] - x_data[0])
+
+        # (段数, 通道数, fftSize)的滑动窗口视图, 不拷贝数据
+        segments = np.lib.stride_tricks.sliding_window_view(self._yBuffer.view(), self._fftSize, axis=0)[::-self._hop][:self._averages]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        power = np.abs(np.fft.rfft(segments * self._taper, axis=-1)) ** 2
+        self._spectrum = np.sqrt(power.mean(axis=0)) * self._scale
+        self._freqs = np.fft.rfftfreq(self._fftSize, d=1 / sampleRate)
+
+        # 对数坐标下0值无法显示
+        spectrum = np.maximum(self._spectrum, np.finfo(np.float64).tiny)
+        for i, curve in enumerate(self.curves):
+            curve.setData(self._freqs, spectrum[i])
+
+        # 显示直流分量以外的峰值频率
+        peak = np.unravel_index(np.argmax(self._spectrum[:, 1:]), self._spectrum[:, 1:].shape)
+        self.max_text.setText(f'Peak: {self._freqs[peak[1] + 1]:.2f}Hz')
+        self.max_text.setPos(self._freqs[-1], np.log10(spectrum.max()))
+
+
+    def sampleAt(self, x):
+        """返回与频率x最近的各通道幅值"""
+        if self._spectrum is None:
+            return None
+        i = self._nearest(self._freqs, x)
+        return self._freqs[i], self._spectrum[:, i]
+
+
+    def save_data(self, filename):
+        """保存最近一次计算的频谱为CSV文件, 每个通道一列"""
+        if self._spectrum is None:
+            return
+        names = [self._names[i] if self._names is not None and i < len(self._names) else str(i) for i in range(len(self._spectrum))]
+        np.savetxt(filename, np.column_stack((self._freqs, self._spectrum.T)), delimiter=",", header=",".join(["freq"] + names), comments="")
+        print(f"Data saved to {filename}")
+
+
+
+class SpectrogramWindow(PlotSubWindow):
+    """
+        滚动的时频图(瀑布图), 显示单个通道的短时傅里叶变换
+
+        每hop(fftSize / 2)个新数据对应一列频谱, 重绘时一次rfft批量计算所有新的列, 以dB写入预分配的二维环形缓冲区,
+        通过ImageItem和颜色查找表显示. 环形缓冲区使用双写的方式保持最近的列连续, 新增列时不移动已有的图像数据.
+        显示的时长为historySize秒, 按预期的采样频率确定列数
+    """
+
+    DEFAULT_FFT_SIZE = 256
+    DYNAMIC_RANGE = 80      # 未指定levels时, 颜色范围为最大值以下DYNAMIC_RANGE dB
+    COLOR_MAP = "viridis"
+
+    def __init__(self, title, callback, row, col, xRange, yRange, win, fftSize = DEFAULT_FFT_SIZE, historySize = 10, sampleRate = RollWindow.DEFAULT_SAMPLE_RATE, levels = None):
+        """
+
+        Args:
+            fftSize (int, optional): 每列的数据长度, 频率分辨率为采样频率 / fftSize. Defaults to DEFAULT_FFT_SIZE.
+            historySize (int, optional): 显示的时长(s). Defaults to 10.
+            sampleRate (int, optional): 预期的采样频率(Hz), 用于确定缓冲区的容量. Defaults to RollWindow.DEFAULT_SAMPLE_RATE.
+            levels (tuple, optional): 颜色对应的dB范围, None时跟随最大值自动调整. Defaults to None.
+        """
+        self._fftSize = int(fftSize)
+        self._hop = max(self._fftSize // 2, 1)
+        self._historyColumns = max(int(historySize * sampleRate / self._hop), 2)
+        # 样本缓冲区额外保留约1s的数据, 重绘间隔内的新数据都可以计算
+        self._sampleCapacity = self._fftSize + int(sampleRate)
+        self._taper = np.hanning(self._fftSize)
+        self._scale = 2 / self._taper.sum()
+        self._fixedLevels = levels is not None
+        self._levels = list(levels) if levels is not None else None
+        super().__init__(title, callback, row, col, xRange, yRange, win)
+        self.curve.hide()
+        self.max_text.hide()
+        self.min_text.hide()
+        self.image = pg.ImageItem(axisOrder="col-major")
+        self.image.setLookupTable(pg.colormap.get(self.COLOR_MAP).getLookupTable(nPts=256))
+        self.plot.addItem(self.image)
+        self.plot.setLabel("left", "Hz")
+        if xRange is None:
+            self.plot.enableAutoRange(axis="x")
+        if yRange is None:
+            self.plot.enableAutoRange(axis="y")
+
+
+    def _initBuffers(self):
+        self._xBuffer = RingBuffer(self._sampleCapacity)
+        self._yBuffer = RingBuffer(self._sampleCapacity)
+        # 每行为一列频谱, 行数为显示的列数
+        self._columns = RingBuffer(self._historyColumns, self._fftSize // 2 + 1)
+        self._columnTimes = RingBuffer(self._historyColumns)
+        self._nextEnd = None    # 下一列数据结束位置的绝对序号
+        self._freqs = None
+
+
+    @property
+    def x_data(self):
+        return self._xBuffer.view()
+
+
+    @property
+    def y_data(self):
+        return self._yBuffer.view()
+
+
+    def _append(self, x, y):
+        self._xBuffer.append(x)
+        self._yBuffer.append(y)
+
+
+    def _extend(self, xs, ys):
+        self._xBuffer.extend(xs)
+        self._yBuffer.extend(ys)
+
+
+    def _computeColumns(self):
+        """计算所有新的列, 数据已被覆盖的列直接跳过"""
+        x_data = self._xBuffer.view()
+        y_data = self._yBuffer.view()
+        total = self._yBuffer.total
+        first = total - len(y_data)     # y_data[0]的绝对序号
+        if self._nextEnd is None:
+            self._nextEnd = first + self._fftSize
+        if self._nextEnd - self._fftSize < first:
+            self._nextEnd += -(-(first - self._nextEnd + self._fftSize) // self._hop) * self._hop
+        ends = np.arange(self._nextEnd, total + 1, self._hop)
+        if len(ends) == 0:
+            return
+        segments = np.lib.stride_tricks.sliding_window_view(y_data, self._fftSize)[ends - self._fftSize - first]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        magnitude = np.abs(np.fft.rfft(segments * self._taper, axis=-1)) * self._scale
+        columns = 20 * np.log10(np.maximum(magnitude, np.finfo(np.float64).tiny))
+        self._columns.extend(columns)
+        self._columnTimes.extend(x_data[ends - 1 - first])
+        self._nextEnd = ends[-1] + self._hop
+        if not self._fixedLevels:
+            top = float(columns.max()) if self._levels is None else max(self._levels[1], float(columns.max()))
+            self._levels = [top - self.DYNAMIC_RANGE, top]
+
+
+    def _render(self):
+        self._computeColumns()
+        times = self._columnTimes.view()
+        if len(times) < 2:
+            return
+        x_data = self._xBuffer.view()
+        sampleRate = (len(x_data) - 1) / (x_data[-1] - x_data[0])
+        # 图像的每一行为一列频谱, 只传入视图, 由ImageItem按查找表转换
+        self.image.setImage(self._columns.view(), autoLevels=False, levels=self._levels)
+        self.image.setRect(pg.QtCore.QRectF(times[0], 0, times[-1] - times[0], sampleRate / 2))
+        self._freqs = np.fft.rfftfreq(self._fftSize, d=1 / sampleRate)
+
+
+    def sampleAt(self, x):
+        """返回与时间x最近的一列及该列幅值最大的频率"""
+        times = self._columnTimes.view()
+        if len(times) == 0 or self._freqs is None:
+            return None
+        i = self._nearest(times, x)
+        return times[i], self._freqs[np.argmax(self._columns.view()[i])]
 
 
 
@@ -329,31 +2959,64 @@ class PlotWindowType(IntEnum):
     ROLL_WINDOW = 0
     COMPRESS_WINDOW = 1
     FIXED_WINDOW = 2
+    MULTI_WINDOW = 3
+    SPECTRUM = 4
+    SPECTROGRAM = 5
 
 
 class RealTimePlot(QMainWindow):
+
+    OVERLAY_INTERVAL = 0.5  # 统计信息显示的刷新间隔(s)
+    CROSSHAIR_RATE = 60     # 十字线每秒最多更新的次数
     
-    def __init__(self, title, msec, suber: Suber):
+    def __init__(self, title, msec, suber: Suber, profile: RenderProfile=None):
+        """profile为所有子窗口默认的绘制参数, 也可以在addSubWindow中单独设置"""
         super().__init__()
         self.win = pg.GraphicsLayoutWidget(show=True)
         self.setWindowTitle(title)
         self.setCentralWidget(self.win)
+        self._profile = profile if profile is not None else RenderProfile()
+        if self._profile.useOpenGL:
+            self.win.useOpenGL(True)
         self._plots = {}
         self._suber = suber
+        self._recorder = None
+        self._stats = PipelineStats()
+        self._frames = 0
+        self._startT = time.perf_counter()
+        self._overlay = None
+        self._overlayT = 0
+        self._crosshairProxy = None
+
+        # 按topic将消息分发到子窗口, key为None的子窗口接收所有的消息
+        self._routes = {}
+        # 命名的派生通道(name, topic, Channel), 分发前计算一次并追加到values
+        self._channels = []
+        self._suber.connect(self._dispatch)
+        self._suber.connectBatch(self._dispatchBatch)
 
         # 在窗口显示时最大化 
         self.showMaximized()
-        # 设置一个计时器来调用更新函数
+        # 数据接收只写入各子窗口的缓冲区, 由定时器按固定间隔重绘有数据变化的子窗口
+        # 接收频率与重绘频率相互独立, 高频数据流不会导致同样频率的重绘
         self._timerInterval = msec
-        # self.timer = pg.QtCore.QTimer()
-        # self.timer.start(msec)  # 每100毫秒更新一次
+        self.timer = pg.QtCore.QTimer()
+        self.timer.timeout.connect(self.renderFrame)
+        self.timer.start(msec)
 
 
-    def addSubWindow(self, title, callback, row, col, xRange=None, yRange=None, windowType:PlotWindowType=PlotWindowType.ROLL_WINDOW, rollWindowSize=10):
+    def addSubWindow(self, title, callback, row, col, xRange=None, yRange=None, windowType:PlotWindowType=PlotWindowType.ROLL_WINDOW, rollWindowSize=10, sampleRate=RollWindow.DEFAULT_SAMPLE_RATE, topic=None, profile: RenderProfile=None,
+                     fftSize=SpectrumWindow.DEFAULT_FFT_SIZE, averages=SpectrumWindow.DEFAULT_AVERAGES):
+        """topic不为None时, 子窗口只接收该topic的消息; profile为None时使用RealTimePlot的绘制参数; fftSize和averages用于频谱窗口, fftSize也用于时频图"""
         if title not in self._plots.keys():
-            subWindow = self.createSubWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, windowType=windowType,  rollWindowSize=rollWindowSize)
+            subWindow = self.createSubWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, windowType=windowType,  rollWindowSize=rollWindowSize, sampleRate=sampleRate, topic=topic,
+                                             fftSize=fftSize, averages=averages)
+            subWindow.setRenderProfile(profile if profile is not None else self._profile)
+            subWindow.recorder = self._recorder
+            subWindow.stats = self._stats
+            subWindow.topic = topic
             self._plots.update({title: subWindow})
-            self._suber.connect(subWindow.update)
+            self._routes.setdefault(topic, []).append(subWindow)
             return subWindow
         else:
             warnings.warn(f"You have add the sub window named {title}")
@@ -361,18 +3024,48 @@ class RealTimePlot(QMainWindow):
 
     def delSubWindow(self, title):
         if title in self._plots.keys():
-            self._plots.pop(title)
+            subWindow = self._plots.pop(title)
+            self._routes[subWindow.topic].remove(subWindow)
     
 
-    def createSubWindow(self, title, callback, row, col, xRange=None, yRange=None, rollWindowSize: int=10, windowType:PlotWindowType=PlotWindowType.ROLL_WINDOW):
+    def createSubWindow(self, title, callback, row, col, xRange=None, yRange=None, rollWindowSize: int=10, windowType:PlotWindowType=PlotWindowType.ROLL_WINDOW, sampleRate=RollWindow.DEFAULT_SAMPLE_RATE, topic=None,
+                        fftSize=SpectrumWindow.DEFAULT_FFT_SIZE, averages=SpectrumWindow.DEFAULT_AVERAGES):
         subWindow = None
+        names = None
+        if isinstance(callback, Channel):
+            callback.bind(lambda column: self.columnIndex(column, topic))
+        elif isinstance(callback, (list, tuple)):
+            # 多条曲线按多个列绑定, 列名作为图例
+            names = [str(column) for column in callback]
+            callback = [self.columnIndex(column, topic) for column in callback]
+        elif not callable(callback):
+            callback = self.columnIndex(callback, topic)
         if windowType == PlotWindowType.COMPRESS_WINDOW:
             subWindow = CompressWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win)
         elif windowType == PlotWindowType.ROLL_WINDOW:
-            subWindow = RollWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, rollWindowSize=rollWindowSize)
+            subWindow = RollWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, rollWindowSize=rollWindowSize, sampleRate=sampleRate)
+        elif windowType == PlotWindowType.FIXED_WINDOW:
+            # 扫描宽度与滚动窗口大小共用rollWindowSize参数
+            subWindow = FixedWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, sweepSize=rollWindowSize, sampleRate=sampleRate)
+        elif windowType == PlotWindowType.MULTI_WINDOW:
+            subWindow = MultiCurveWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, rollWindowSize=rollWindowSize, sampleRate=sampleRate, names=names)
+        elif windowType == PlotWindowType.SPECTRUM:
+            subWindow = SpectrumWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, fftSize=fftSize, averages=averages, names=names)
+        elif windowType == PlotWindowType.SPECTROGRAM:
+            # 显示时长与滚动窗口大小共用rollWindowSize参数
+            subWindow = SpectrogramWindow(title=title, callback=callback, row=row, col=col, xRange=xRange, yRange=yRange, win=self.win, fftSize=fftSize, historySize=rollWindowSize, sampleRate=sampleRate)
         return subWindow
 
 
+    def setRenderProfile(self, profile: RenderProfile):
+        """修改所有子窗口的绘制参数"""
+        if profile.useOpenGL != self._profile.useOpenGL:
+            self.win.useOpenGL(profile.useOpenGL)
+        self._profile = profile
+        for subWindow in self._plots.values():
+            subWindow.setRenderProfile(profile)
+
+
     def getSubWindow(self, title):
         return self._plots.get(title, None)
     
@@ -381,7 +3074,168 @@ class RealTimePlot(QMainWindow):
 
         self._triggerObj = triggerObj
         for title, plotWIndow in self._plots.items():
-            self._triggerObj.connect(plotWIndow.update)
+            self._triggerObj.connect(plotWIndow.append)
+
+
+    def addChannel(self, name, channel: Channel, topic=None):
+        """
+            添加命名的派生通道(如滤波后的数据), 分发前对每批数据计算一次, 作为新的列追加到values的末尾,
+            子窗口按name绑定. 原始数据和派生数据可以在多个子窗口或同一个MultiCurveWindow中叠加显示, 不需要重复计算
+
+        Args:
+            name (str): 派生通道的名称
+            channel (Channel): 派生通道, 只能使用Suber的原始列
+            topic (str, optional): 只对该topic的消息计算, None表示所有消息. Defaults to None.
+        """
+        channel.bind(lambda column: self._suber.columnIndex(column, topic))
+        self._channels.append((name, topic, channel))
+
+
+    def columnIndex(self, column, topic=None):
+        """将列名转换为列序号, 包括addChannel添加的派生通道"""
+        if isinstance(column, str):
+            derived = [n for n, t, _ in self._channels if t is None or t == topic]
+            if column in derived:
+                columns = self._suber.columns
+                columns = columns.get(topic) if isinstance(columns, dict) else columns
+                if columns is None:
+                    raise KeyError(f"Derived channel {column} requires the columns of topic {topic}")
+                return len(columns) + derived.index(column)
+        return self._suber.columnIndex(column, topic)
+
+
+    def _derive(self, topic, xs, values):
+        """计算该topic的所有派生通道, 返回追加后的values"""
+        channels = [channel for _, t, channel in self._channels if t is None or t == topic]
+        if not channels or values is None:
+            return values
+        t = time.perf_counter()
+        derived = np.column_stack([channel.apply(xs, values) for channel in channels])
+        values = np.concatenate((values, derived), axis=1)
+        self._stats.record("derive", time.perf_counter() - t)
+        return values
+
+
+    def _dispatch(self, rtMsg: RTMessage):
+        """将消息交给绑定了该topic的子窗口, 以及不区分topic的子窗口"""
+        if self._channels and rtMsg.values is not None:
+            values = self._derive(rtMsg.topic, np.array([rtMsg.totalTime]), rtMsg.values[np.newaxis])
+            rtMsg = replace(rtMsg, values=values[0])
+        for subWindow in self._routes.get(rtMsg.topic, ()):
+            subWindow.append(rtMsg)
+        if rtMsg.topic is not None:
+            for subWindow in self._routes.get(None, ()):
+                subWindow.append(rtMsg)
+
+
+    def _dispatchBatch(self, batch: RTBatch):
+        if self._channels and batch.values is not None and len(batch):
+            batch = replace(batch, values=self._derive(batch.topic, batch.totalTimes, batch.values))
+        for subWindow in self._routes.get(batch.topic, ()):
+            subWindow.appendBatch(batch)
+        if batch.topic is not None:
+            for subWindow in self._routes.get(None, ()):
+                subWindow.appendBatch(batch)
+
+
+    def renderFrame(self):
+        """重绘自上一帧以来数据发生变化的子窗口"""
+        # 共享内存等需要主动读取的数据源在重绘之前读取
+        poll = getattr(self._suber, "poll", None)
+        if poll is not None:
+            poll()
+        frameT = time.perf_counter()
+        rendered = False
+        for plotWindow in self._plots.values():
+            t = time.perf_counter()
+            if plotWindow.render():
+                self._stats.record("render", time.perf_counter() - t)
+                rendered = True
+        if rendered:
+            self._frames += 1
+            self._stats.record("frame", time.perf_counter() - frameT)
+        if self._overlay is not None and frameT - self._overlayT >= self.OVERLAY_INTERVAL:
+            self._overlayT = frameT
+            self._updateOverlay()
+
+
+    def stats(self):
+        """返回各阶段的耗时统计, 接收相关的阶段来自Suber"""
+        elapsed = time.perf_counter() - self._startT
+        stages = {}
+        suberStats = getattr(self._suber, "stats", None)
+        if suberStats is not None:
+            stages.update(suberStats.snapshot())
+        stages.update(self._stats.snapshot())
+        sequences = getattr(self._suber, "sequences", {})
+        return {"messages": getattr(self._suber, "count", None), "frames": self._frames, "fps": self._frames / elapsed if elapsed > 0 else 0,
+                "stages": stages, "sequence": {topic: tracker.summary() for topic, tracker in list(sequences.items())}}
+
+
+    def enableCrosshair(self, enable=True):
+        """
+            显示鼠标十字线, 鼠标所在子窗口的x同步到所有x轴含义相同的子窗口, 并显示各子窗口中与x最近的数据.
+            鼠标移动事件经过SignalProxy限制频率, 数据在有序的时间缓冲区中二分查找, 与数据量无关
+        """
+        if enable and self._crosshairProxy is None:
+            self._crosshairProxy = pg.SignalProxy(self.win.scene().sigMouseMoved, rateLimit=self.CROSSHAIR_RATE, slot=self._mouseMoved)
+        elif not enable and self._crosshairProxy is not None:
+            self._crosshairProxy.disconnect()
+            self._crosshairProxy = None
+            for subWindow in self._plots.values():
+                subWindow.hideCrosshair()
+
+
+    def _mouseMoved(self, event):
+        pos = event[0]
+        for subWindow in self._plots.values():
+            if subWindow.plot.sceneBoundingRect().contains(pos):
+                x = subWindow.plot.vb.mapSceneToView(pos).x()
+                for other in self._plots.values():
+                    if other.X_AXIS == subWindow.X_AXIS:
+                        other.showCrosshair(x)
+                return
+
+
+    def showStatsOverlay(self, show=True):
+        """在窗口左上角显示各阶段耗时的统计"""
+        if show and self._overlay is None:
+            self._overlay = QLabel(self.win)
+            self._overlay.setStyleSheet("QLabel { background-color: rgba(0, 0, 0, 160); color: rgb(200, 200, 200); font-family: monospace; padding: 4px; }")
+            self._overlay.move(10, 10)
+            self._overlay.show()
+            self._updateOverlay()
+        elif not show and self._overlay is not None:
+            self._overlay.deleteLater()
+            self._overlay = None
+
+
+    def _updateOverlay(self):
+        stats = self.stats()
+        lines = [f"messages {stats['messages']}  frames {stats['frames']}  fps {stats['fps']:.1f}"]
+        for stage, summary in stats["stages"].items():
+            if summary["count"]:
+                lines.append(f"{stage:<9}p50 {summary['p50Us']:9.1f}us  p99 {summary['p99Us']:9.1f}us  n {summary['count']}")
+        self._overlay.setText("\n".join(lines))
+        self._overlay.adjustSize()
+
+
+    def startRecording(self, directory=None, flushInterval=Recorder.FLUSH_INTERVAL):
+        """开始将所有子窗口的数据流式写入磁盘"""
+        if directory is None:
+            directory = datetime.now().strftime("%Y%m%d_%H_%M_%S") + "_record"
+        self._recorder = Recorder(directory, flushInterval)
+        for plot in self._plots.values():
+            plot.recorder = self._recorder
+        return self._recorder
+
+
+    def stopRecording(self):
+        if self._recorder is not None:
+            for plot in self._plots.values():
+                plot.recorder = None
+            self._recorder.close()
+            self._recorder = None
 
 
     def save_all_data(self):
@@ -397,36 +3251,29 @@ class RealTimePlot(QMainWindow):
 
 if __name__ == '__main__':
 
-    suber = Suber("tcp://127.0.0.1:5556")
+    suber = Suber("tcp://127.0.0.1:5556", columns=["x", "y", "z"])
     app = QApplication(sys.argv)
 
     rtPlot = RealTimePlot("Data", 10, suber)
     rtPlot.setUpdateTrigger(suber)
+    rtPlot.enableCrosshair()
     
 
-    def xFunc(rtMsg:RTMessage):
-        return rtMsg.totalTime, float(rtMsg.message.split(",")[0])
-
-    def yFunc(rtMsg: RTMessage):
-        return rtMsg.totalTime, float(rtMsg.message.split(",")[1])
-
-    def zFunc(rtMsg: RTMessage):
-        z = float(rtMsg.message.split(",")[2])
-        if abs(z) <= 0.4:
-            z = 0
-        return rtMsg.totalTime, z
-
+    # 直接绑定解码后的列, 每条消息只解析一次
+    rtPlot.addSubWindow(title="X2", callback="x", row=1,col=1, yRange=(-10,10), windowType=PlotWindowType.ROLL_WINDOW)
+    rtPlot.addSubWindow(title="Y2", callback="y", row=2,col=1, yRange=(-10,10), windowType=PlotWindowType.ROLL_WINDOW)
+    # z的绝对值不超过0.4时置为0, 以派生通道向量化计算
+    rtPlot.addSubWindow(title="Z2", callback=Channel("z").deadband(0.4), row=3,col=1, yRange=(-2,5), windowType=PlotWindowType.ROLL_WINDOW)
 
-    rtPlot.addSubWindow(title="X2", callback=xFunc, row=1,col=1, yRange=(-10,10), windowType=PlotWindowType.ROLL_WINDOW)
-    rtPlot.addSubWindow(title="Y2", callback=yFunc, row=2,col=1, yRange=(-10,10), windowType=PlotWindowType.ROLL_WINDOW)
-    rtPlot.addSubWindow(title="Z2", callback=zFunc, row=3,col=1, yRange=(-2,5), windowType=PlotWindowType.ROLL_WINDOW)
 
+    # 运行过程中将数据流式写入磁盘, 需要CSV时使用Recorder.toCsv离线转换
+    rtPlot.startRecording()
 
-    # 退出时自动保存数据
+    # 退出时停止记录
     def on_exit():
-        rtPlot.save_all_data()
+        rtPlot.stopRecording()
         suber.stop()
-    # app.aboutToQuit.connect(lambda: rtPlot.save_all_data())
+    app.aboutToQuit.connect(on_exit)
     suber.start()
     rtPlot.show()
     sys.exit(app.exec_())
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# coding=utf-8
+'''
+Author       : Jay jay.zhangjunjie@outlook.com
+Date         : 2026-10-18 16:00:00
+LastEditTime : 2026-10-18 16:00:00
+LastEditors  : Jay jay.zhangjunjie@outlook.com
+Description  : 离线查看Recorder记录的数据, 使用min/max多分辨率金字塔, 缩放和平移的耗时与记录长度无关
+'''
+import argparse
+import os
+import sys
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QApplication, QMainWindow
+
+from rtplot import Recorder
+
+
+"""
+    How to use
+        python rtviewer.py record_20241018_10_00_00                 # 显示记录中所有的通道
+        python rtviewer.py record_20241018_10_00_00 --channels X2 Y2
+
+    LOD金字塔:
+        第0层为memmap的原始数据, 第k层每个桶包含FACTOR^k个原始数据, 保存桶的起始x以及y的最小值和最大值.
+        金字塔只在第一次打开时构建一次(按块读取原始数据, 不需要全部载入内存), 缓存为数据文件旁边的<文件名>.lod.npz,
+        数据文件的长度或修改时间变化后重新构建. 每次视图变化时, 按视图范围二分查找起止位置, 选择桶数不超过视图像素宽度的最精细的一层,
+        每个桶显示为最小值和最大值两个点, 因此显示的点数只与窗口宽度有关
+"""
+
+
+class LODPyramid:
+    """单个通道的min/max多分辨率金字塔"""
+
+    FACTOR = 8              # 相邻两层的桶大小之比
+    MIN_LEVEL_SIZE = 1024   # 最粗的一层不超过该桶数
+    CHUNK_SIZE = 1 << 21    # 构建第1层时每次读取的原始数据个数, 为FACTOR的整数倍
+    CACHE_SUFFIX = ".lod.npz"
+
+    def __init__(self, path):
+        """path为Recorder记录的通道文件, 按(x, y)两个float64交替存放"""
+        self.path = path
+        # 记录中断时文件末尾可能有不完整的记录, 只读取完整的部分
+        self.raw = Recorder.mapChannel(path)
+        self.levels = self._loadCache()
+        if self.levels is None:
+            self.levels = self._build()
+            self._saveCache()
+
+
+    def __len__(self):
+        return len(self.raw)
+
+
+    @property
+    def xRange(self):
+        if len(self.raw) == 0:
+            return (0, 1)
+        return (float(self.raw[0, 0]), float(self.raw[-1, 0]))
+
+
+    def _reduce(self, x, low, high):
+        """将一层按FACTOR合并为下一层, 最后不足FACTOR个的桶单独合并"""
+        n = len(x)
+        full = n // self.FACTOR * self.FACTOR
+        xs = x[:full:self.FACTOR]
+        lows = low[:full].reshape(-1, self.FACTOR).min(axis=1)
+        highs = high[:full].reshape(-1, self.FACTOR).max(axis=1)
+        if full < n:
+            xs = np.append(xs, x[full])
+            lows = np.append(lows, low[full:].min())
+            highs = np.append(highs, high[full:].max())
+        return xs, lows, highs
+
+
+    def _build(self):
+        levels = []
+        if len(self.raw) <= self.MIN_LEVEL_SIZE:
+            return levels
+        # 第1层按块读取memmap, 内存占用与记录长度无关
+        parts = []
+        for start in range(0, len(self.raw), self.CHUNK_SIZE):
+            chunk = np.asarray(self.raw[start:start + self.CHUNK_SIZE])
+            parts.append(self._reduce(chunk[:, 0], chunk[:, 1], chunk[:, 1]))
+        level = tuple(np.concatenate(arrays) for arrays in zip(*parts))
+        levels.append(level)
+        while len(level[0]) > self.MIN_LEVEL_SIZE:
+            level = self._reduce(*level)
+            levels.append(level)
+        return levels
+
+
+    def _cachePath(self):
+        return self.path + self.CACHE_SUFFIX
+
+
+    def _loadCache(self):
+        path = self._cachePath()
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as cache:
+            if "mtime" not in cache.files or float(cache["mtime"]) != os.path.getmtime(self.path):
+                return None
+            if int(cache["size"]) != len(self.raw) or int(cache["factor"]) != self.FACTOR:
+                return None
+            return [(cache[f"x{k}"], cache[f"low{k}"], cache[f"high{k}"]) for k in range(int(cache["count"]))]
+
+
+    def _saveCache(self):
+        arrays = {"size": len(self.raw), "mtime": os.path.getmtime(self.path), "factor": self.FACTOR, "count": len(self.levels)}
+        for k, (x, low, high) in enumerate(self.levels):
+            arrays.update({f"x{k}": x, f"low{k}": low, f"high{k}": high})
+        # 先写临时文件再替换, 避免中断时留下不完整的缓存
+        tmp = self._cachePath() + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self._cachePath())
+
+
+    def query(self, x0, x1, pixels):
+        """
+            返回[x0, x1]范围内用于显示的(x, y), 点数不超过约4 * pixels
+
+        Args:
+            x0 (float): 视图的起始x
+            x1 (float): 视图的结束x
+            pixels (int): 视图的像素宽度
+        """
+        xs = self.raw[:, 0]
+        # 多取视图两侧各一个点, 保证曲线延伸到视图边缘
+        i0 = max(int(np.searchsorted(xs, x0)) - 1, 0)
+        i1 = min(int(np.searchsorted(xs, x1, side="right")) + 1, len(xs))
+        count = i1 - i0
+        maxBuckets = max(int(pixels), 1)
+        if count <= 2 * maxBuckets or not self.levels:
+            return np.asarray(self.raw[i0:i1, 0]), np.asarray(self.raw[i0:i1, 1])
+
+        # 选择桶数不超过像素宽度的最精细的一层
+        size = 1
+        for x, low, high in self.levels:
+            size *= self.FACTOR
+            if count // size <= maxBuckets:
+                break
+        b0, b1 = i0 // size, -(-i1 // size)
+        x, low, high = x[b0:b1], low[b0:b1], high[b0:b1]
+        # 最粗的一层仍然超过像素宽度时(视图很窄或缓存来自旧版本), 在查询时继续合并
+        while len(x) > 2 * maxBuckets:
+            x, low, high = self._reduce(x, low, high)
+        n = len(x)
+        points = np.empty((n, 2))
+        values = np.empty((n, 2))
+        points[:] = x[:, np.newaxis]
+        values[:, 0] = low
+        values[:, 1] = high
+        return points.ravel(), values.ravel()
+
+
+
+class OfflineViewer(QMainWindow):
+    """每个通道一个子窗口, x轴联动, 视图变化时按当前范围和像素宽度从金字塔中取出数据"""
+
+    RATE_LIMIT = 60     # 视图变化时最多每秒更新的次数
+
+    def __init__(self, directory, channels=None):
+        super().__init__()
+        self.win = pg.GraphicsLayoutWidget(show=True)
+        self.setWindowTitle(directory)
+        self.setCentralWidget(self.win)
+
+        files = Recorder.files(directory)
+        self._pyramids = {}
+        self._curves = {}
+        self._proxies = []
+        firstPlot = None
+        channels = list(files.keys()) if channels is None else channels
+        for row, channel in enumerate(channels):
+            pyramid = self._pyramids[channel] = LODPyramid(files[channel])
+            plot = self.win.addPlot(row, 0, title=channel)
+            self._curves[channel] = plot.plot(pen=pg.mkPen(color="w", width=1))
+            if firstPlot is None:
+                firstPlot = plot
+            else:
+                plot.setXLink(firstPlot)
+            plot.getViewBox().setXRange(*pyramid.xRange, padding=0)
+            plot.enableAutoRange(axis="y")
+            plot.setAutoVisible(y=True)
+            self._proxies.append(pg.SignalProxy(plot.getViewBox().sigXRangeChanged, rateLimit=self.RATE_LIMIT,
+                                                slot=lambda args, channel=channel, plot=plot: self._update(channel, plot)))
+            self._update(channel, plot)
+
+
+    def _update(self, channel, plot):
+        viewBox = plot.getViewBox()
+        x0, x1 = viewBox.viewRange()[0]
+        x, y = self._pyramids[channel].query(x0, x1, max(int(viewBox.width()), 100))
+        self._curves[channel].setData(x, y)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rtplot offline viewer")
+    parser.add_argument("directory", help="Recorder记录的目录")
+    parser.add_argument("--channels", nargs="+", default=None, help="显示的通道, 默认为所有通道")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    viewer = OfflineViewer(args.directory, args.channels)
+    viewer.showMaximized()
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()